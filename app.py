@@ -3,15 +3,69 @@ Structural Momentum (ChatGPT interpretation of Michael Oliver's approach)
 Updated on 2025-08-22
 '''
 
-from flask import Flask, request, Response, render_template_string
-import yfinance as yf
-import pandas as pd
-import plotly.graph_objects as go
-from plotly.subplots import make_subplots
-import plotly.io as pio
+import html
+import os
+import threading
+import time
+
+from flask import Flask, request, Response, g, jsonify, render_template_string
+
+# Only light modules here so "/" and /healthz answer straight away; numpy,
+# pandas, plotly and the data provider are imported by warm() or on first use
+import assets
+import chart_cache
+import compress
+import metrics
+import symbols
 
 app = Flask(__name__)
 
+# Default points per trace on phones, roughly two per horizontal pixel
+MOBILE_MAX_POINTS = int(os.environ.get('MOBILE_MAX_POINTS', 1000))
+BATCH_MAX_TICKERS = int(os.environ.get('BATCH_MAX_TICKERS', 100))
+# Most MA periods one sweep request (ma=10:200:10 or ma=10,20,50) may ask for
+MA_SWEEP_MAX = int(os.environ.get('MA_SWEEP_MAX', 64))
+# Columns in a sweep heatmap when max_points doesn't set a lower limit
+SWEEP_HEATMAP_POINTS = int(os.environ.get('SWEEP_HEATMAP_POINTS', 2000))
+# Warm up in a background thread at import; gunicorn.conf.py turns this off and
+# warms from its own hooks instead
+WARM_ON_IMPORT = os.environ.get('WARM_ON_IMPORT', '1') != '0'
+
+_warmed = threading.Event()
+_warm_pid = None
+
+
+def warm(background=True):
+    '''Import the heavy modules and build everything the first chart request needs.'''
+    # Imported for their side effect of being loaded; requests then find them in sys.modules
+    import bar_store, downsample, figure, indicators, metadata, providers, serialize
+    providers.get_provider()
+
+    # Build the mobile and desktop layouts once instead of on every request
+    figure.warm()
+    assets.plotlyjs()
+
+    if background:
+        # Comma-separated tickers whose names are fetched in the background at startup
+        metadata.preload(os.environ.get('PRELOAD_TICKERS', '').split(','))
+        # Keeps the watchlist's bars fresh and its charts in the chart cache
+        import scheduler
+        scheduler.start()
+    _warmed.set()
+
+
+def warm_in_background():
+    '''Start warm() on a daemon thread, once per process.'''
+    global _warm_pid
+    if _warm_pid == os.getpid():
+        return
+    _warm_pid = os.getpid()
+    threading.Thread(target=warm, name='warm', daemon=True).start()
+
+
+if WARM_ON_IMPORT:
+    warm_in_background()
+
 # HTML template for the form
 HTML_TEMPLATE = """
 <!DOCTYPE html>
@@ -386,226 +440,550 @@ HTML_TEMPLATE = """
 </html>
 """
 
+@app.before_request
+def _start_timer():
+    g.start = time.perf_counter()
+
+@app.after_request
+def _record_timing(response):
+    elapsed = time.perf_counter() - g.get('start', time.perf_counter())
+    metrics.request_seconds.observe(elapsed, endpoint=request.endpoint or 'unknown', status=response.status_code)
+    timing = metrics.server_timing()
+    response.headers['Server-Timing'] = f"{timing}, total;dur={elapsed * 1000:.1f}" if timing else f"total;dur={elapsed * 1000:.1f}"
+    return response
+
+@app.route("/metrics")
+def prometheus_metrics():
+    return Response(metrics.render(), mimetype='text/plain; version=0.0.4')
+
 @app.route("/")
 def home():
     return render_template_string(HTML_TEMPLATE)
 
+@app.route("/healthz")
+def healthz():
+    # Up as soon as the app is imported; "warm" says whether the first chart will be quick
+    return jsonify(status="ok", warm=_warmed.is_set())
+
+@app.route("/assets/<name>")
+def asset(name):
+    filename, _ = assets.plotlyjs()
+    if name != filename:
+        return "Not found", 404
+    encoding = compress.choose(request.accept_encodings)
+    response = Response(assets.plotlyjs_encoded(encoding), mimetype='application/javascript')
+    if encoding != compress.IDENTITY:
+        response.content_encoding = encoding
+    response.vary.add('Accept-Encoding')
+    response.headers['Cache-Control'] = assets.IMMUTABLE_CACHE_CONTROL
+    response.set_etag(compress.variant_etag(filename, encoding))
+    return response.make_conditional(request)
+
+def render_chart_chunks(data, ticker, tickername, ma_period, interval, is_mobile, max_points=None, first=None,
+                        live=True, revision=None):
+    '''Yield the chart page in pieces, the head before any indicator work.
+
+    With first, data is a window from bar_store.window(): only bars from
+    first on are drawn, the ones before it just feed the indicators. With
+    live, the page follows /chart/stream for bars that close after it was drawn.
+    revision is the bar store entry's revised_at, for the incremental engine.
+    '''
+    from urllib.parse import urlencode
+    import figure
+    from serialize import epoch_seconds
+    from downsample import lttb_series
+    from indicators import add_indicators
+
+    # CSS and the plotly.js tag go out first so the browser can start on them
+    css = figure.MOBILE_CSS if is_mobile else figure.DESKTOP_CSS
+    div_id = figure.new_div_id()
+    with metrics.stage('inject'):
+        head = figure.page_head(css, assets.plotlyjs_url(), div_id)
+    yield head
+
+    with metrics.stage('indicators'):
+        if first is None:
+            data = add_indicators(data.dropna(), ma_period, series_key=(ticker, interval), revision=revision).dropna()
+        else:
+            # A window isn't the series the incremental engine tracks; it's short anyway
+            data = add_indicators(data.dropna(), ma_period).dropna()
+            data = data[data.index >= first]
+
+    # Decimate each trace separately so every line keeps its own peaks
+    with metrics.stage('downsample'):
+        close = lttb_series(data['Close'], max_points)
+        ma = lttb_series(data['MA'], max_points)
+        momentum = lttb_series(data['Momentum'], max_points)
+        rsi = lttb_series(data['RSI'], max_points)
+
+    traces = [
+        (close.index, close, f"{ticker} Close"),
+        (ma.index, ma, f"{ma_period}-Period MA"),
+        (momentum.index, momentum, "Normalized Momentum"),
+        (rsi.index, rsi, "14-period RSI"),
+    ]
+    with metrics.stage('figure'):
+        fig = figure.chart_figure(traces, figure.chart_title(ticker, tickername, is_mobile), is_mobile)
+
+    print(f"Processing ticker={ticker}, ma={ma_period}, interval={interval}")
+
+    stream_url = None
+    if live and not data.empty:
+        since = int(epoch_seconds(data.index[-1:])[0])
+        query = urlencode({'ticker': ticker, 'ma': ma_period, 'interval': interval, 'since': since})
+        stream_url = f"/chart/stream?{query}"
+    with metrics.stage('serialize'):
+        body = list(figure.page_body(fig, div_id, stream_url))
+    yield from body
+
+def render_sweep_chunks(data, ticker, tickername, periods, interval, is_mobile, max_points=None, first=None,
+                        heatmap=False):
+    '''Like render_chart_chunks() for a list of MA periods, overlaid or as a momentum heatmap.'''
+    import numpy as np
+    import pandas as pd
+    import figure
+    from downsample import lttb_indices, lttb_series
+    from indicators import ma_sweep, rsi
+
+    css = figure.MOBILE_CSS if is_mobile else figure.DESKTOP_CSS
+    div_id = figure.new_div_id()
+    with metrics.stage('inject'):
+        head = figure.page_head(css, assets.plotlyjs_url(), div_id)
+    yield head
+
+    with metrics.stage('indicators'):
+        data = data.dropna()
+        ma, momentum = ma_sweep(data['Close'], periods)
+        rsi_values = rsi(data['Close']).to_numpy()
+        # Show bars where every period is defined, like dropna() on a single chart
+        keep = ~np.isnan(ma).any(axis=0) & ~np.isnan(rsi_values)
+        if first is not None:
+            keep &= data.index >= first
+        index = data.index[keep]
+        close = data['Close'][keep]
+        ma, momentum, rsi_values = ma[:, keep], momentum[:, keep], rsi_values[keep]
+
+    # Decimate each trace separately so every line keeps its own peaks
+    with metrics.stage('downsample'):
+        def thin(values):
+            series = lttb_series(pd.Series(values, index=index), max_points)
+            return series.index, series.to_numpy()
+        close_trace = thin(close.to_numpy()) + (f"{ticker} Close",)
+        mas = [thin(row) for row in ma]
+        rsi_trace = thin(rsi_values)
+        if heatmap:
+            # Every heatmap row needs the same columns; LTTB on the close picks them
+            columns = min(max_points or SWEEP_HEATMAP_POINTS, SWEEP_HEATMAP_POINTS)
+            x = index.values.astype('datetime64[ns]').astype(np.int64)
+            picked = lttb_indices(x, close.to_numpy(), columns)
+            heat = (index[picked], momentum[:, picked])
+            momenta = None
+        else:
+            heat = None
+            momenta = [thin(row) for row in momentum]
+
+    title = figure.chart_title(ticker, tickername, is_mobile)
+    with metrics.stage('figure'):
+        fig = figure.sweep_figure(close_trace, rsi_trace, mas, momenta, periods, title, is_mobile, heatmap=heat)
+
+    print(f"Processing ticker={ticker}, ma={periods[0]}..{periods[-1]} ({len(periods)}), interval={interval}")
+
+    with metrics.stage('serialize'):
+        body = list(figure.page_body(fig, div_id))
+    yield from body
+
+def render_chart(*args, **kwargs):
+    '''The whole chart page as bytes; see render_chart_chunks().'''
+    return b''.join(render_chart_chunks(*args, **kwargs))
+
+def _stream_chart(key, etag, encoding, chunks):
+    # Compress as the page is produced, flushing after each piece so the head
+    # reaches the client before the data is ready; cache both copies at the end
+    compressor = compress.Compressor(encoding)
+    plain, packed = [], []
+    try:
+        for chunk in chunks:
+            plain.append(chunk)
+            out = compressor.compress(chunk, flush=True)
+            packed.append(out)
+            yield out
+        tail = compressor.finish()
+        packed.append(tail)
+        yield tail
+    except Exception as e:
+        # Headers are already sent; end the page with the error instead. The
+        # error may land inside the Plotly.newPlot( script, so close that first
+        print(f"Error in /chart: {e}")
+        yield compressor.compress(f"</script><p>Error: {html.escape(str(e))}</p>".encode()) + compressor.finish()
+        return
+    variants = {compress.IDENTITY: b''.join(plain)}
+    variants[encoding] = b''.join(packed)
+    chart_cache.cache.put(key, etag, variants)
+
+
+def _parse_ma(value):
+    '''MA periods from the ma parameter: 36, a list 10,20,50 or a range 10:200:10 (inclusive).'''
+    value = str(value).strip()
+    if ':' in value:
+        parts = [int(p) for p in value.split(':')]
+        if len(parts) not in (2, 3):
+            raise ValueError(f"Bad ma range {value!r}; use start:stop or start:stop:step")
+        step = parts[2] if len(parts) == 3 else 1
+        if step < 1:
+            raise ValueError("ma range step must be at least 1")
+        periods = range(parts[0], parts[1] + 1, step)
+    else:
+        periods = value.split(',')
+    # Checked before anything is built, so a huge range can't eat the memory
+    if len(periods) > MA_SWEEP_MAX:
+        raise ValueError(f"At most {MA_SWEEP_MAX} MA periods per request")
+    if isinstance(periods, list):
+        periods = [int(p) for p in periods if p.strip()]
+    periods = sorted(set(periods))
+    if not periods or periods[0] < 1:
+        raise ValueError(f"Bad ma {value!r}; periods must be positive")
+    return periods
+
+def _parse_span(args):
+    '''(start, end, lookback) from the query string, e.g. start=2020-01-01,
+    end=2024-12-31, lookback=2y (also 18mo, 6w, 90d) or lookback=500 bars.'''
+    import re
+    import pandas as pd
+    start = args.get("start")
+    end = args.get("end")
+    lookback = args.get("lookback")
+    start = pd.Timestamp(start) if start else None
+    end = pd.Timestamp(end) if end else None
+    if lookback:
+        match = re.fullmatch(r"(\d+)(d|w|mo|y)?", lookback.strip().lower())
+        if match is None:
+            raise ValueError(f"Bad lookback {lookback!r}; use a bar count or e.g. 90d, 6w, 18mo, 2y")
+        count, unit = int(match.group(1)), match.group(2)
+        if unit is None:
+            lookback = count
+        else:
+            lookback = pd.DateOffset(**{{'d': 'days', 'w': 'weeks', 'mo': 'months', 'y': 'years'}[unit]: count})
+    else:
+        lookback = None
+    return start, end, lookback
+
+def _max_points(is_mobile, requested=None):
+    # Points per trace; phones get a default, max_points=0 sends everything
+    if requested is None:
+        requested = MOBILE_MAX_POINTS if is_mobile else 0
+    return requested if requested >= 3 else None
+
+def prerender_chart(ticker, ma_period, interval, is_mobile):
+    '''Put the page a default /chart request would get into the chart cache.
+
+    Returns True if a page was rendered, False if it was cached already or
+    there is no data.
+    '''
+    import bar_store, metadata
+    entry = bar_store.get_entry(ticker, interval)
+    if entry['bars'].dropna().empty:
+        return False
+    tickername = metadata.get_name(ticker)
+    max_points = _max_points(is_mobile)
+    key = (ticker, ma_period, interval, is_mobile, max_points, None)
+    etag = chart_cache.make_etag(key, entry['version'], tickername)
+    if chart_cache.cache.get(key, etag) is not None:
+        return False
+    body = render_chart(entry['bars'], ticker, tickername, ma_period, interval, is_mobile, max_points,
+                        revision=entry.get('revised_at'))
+    variants = {compress.IDENTITY: body}
+    for encoding in compress.available():
+        variants[encoding] = compress.compress(body, encoding)
+    chart_cache.cache.put(key, etag, variants)
+    return True
+
+def _cache_headers(response, etag, entry, interval):
+    import bar_store
+    response.set_etag(etag)
+    response.last_modified = entry['changed_at']
+    # Clients may reuse the page until the bar store would refresh anyway
+    max_age = bar_store.staleness(interval)
+    response.cache_control.public = True
+    response.cache_control.max_age = max(0, int(max_age - (time.time() - entry['fetched_at'])))
+    return response
+
+def _not_modified(etag, entry):
+    # If-Modified-Since only counts without If-None-Match; Last-Modified has whole seconds
+    if request.if_none_match:
+        return request.if_none_match.contains(etag)
+    since = request.if_modified_since
+    return since is not None and int(entry['changed_at']) <= since.timestamp()
+
 @app.route("/chart")
 def chart():
+    import bar_store, metadata
+    from indicators import warmup_bars
     try:
         # --- Get query parameters ---
         ticker = request.args.get("ticker", default="SPY").upper()
-        ma_period = int(request.args.get("ma", default=200))
+        periods = _parse_ma(request.args.get("ma", default="200"))
+        ma_period = periods[0]
         interval = request.args.get("interval", default="1d")
+        # Several MA periods: momentum as one line each or as a period x time heatmap
+        view = request.args.get("view", default="lines")
+        if view not in ("lines", "heatmap"):
+            raise ValueError(f"Unknown view {view!r}; expected lines or heatmap")
+        symbols.check(ticker, interval)
+
+        # Detect if it's a mobile request
+        user_agent = request.headers.get('User-Agent', '').lower()
+        is_mobile = any(x in user_agent for x in ['mobile', 'iphone', 'ipad', 'android'])
+
+        max_points = _max_points(is_mobile, request.args.get("max_points", type=int))
+        start, end, lookback = _parse_span(request.args)
+        span = (start, end, lookback) if (start, end, lookback) != (None, None, None) else None
 
         # --- Fetch data ---
-        data = yf.download(ticker, period='max', interval=interval, auto_adjust=False)
-        tickername = yf.Ticker(ticker).info['shortName']
-        data.columns = data.columns.get_level_values(0)
-        data = data.dropna()
-        if data.empty:
+        with metrics.stage('download'):
+            entry = bar_store.get_entry(ticker, interval)
+        with metrics.stage('metadata'):
+            tickername = metadata.get_name(ticker)
+        if entry['bars'].dropna().empty:
             return f"No data found for {ticker}."
 
-        # --- Calculate Momentum ---
-        data['MA'] = data['Close'].rolling(window=ma_period).mean()
-        data['Momentum'] = (data['Close'] - data['MA']) / data['MA']
-
-        # --- Calculate RSI (14-period) ---
-        delta = data['Close'].diff()
-        gain = delta.where(delta > 0, 0).rolling(window=14).mean()
-        loss = -delta.where(delta < 0, 0).rolling(window=14).mean()
-        rs = gain / loss
-        data['RSI'] = 100 - (100 / (1 + rs))
+        # --- Serve unchanged charts from the client or server cache ---
+        ma_key = ma_period if len(periods) == 1 else (tuple(periods), view)
+        key = (ticker, ma_key, interval, is_mobile, max_points, span)
+        etag = chart_cache.make_etag(key, entry['version'], tickername)
+        encoding = compress.choose(request.accept_encodings)
+        variant = compress.variant_etag(etag, encoding)
+        if _not_modified(variant, entry):
+            metrics.cache_requests.inc(cache='chart', result='not_modified')
+            response = _cache_headers(Response(status=304), variant, entry, interval)
+            response.vary.update(['User-Agent', 'Accept-Encoding'])
+            return response
+
+        variants = chart_cache.cache.get(key, etag)
+        metrics.cache_requests.inc(cache='chart', result='miss' if variants is None else 'hit')
+        if variants is None:
+            bars, first = entry['bars'], None
+            if span is not None:
+                # Only the requested bars plus the indicator warm-up get computed and drawn
+                bars, first = bar_store.window(bars, warmup_bars(periods[-1]), start, end, lookback)
+                if first is None:
+                    return f"No data found for {ticker} in the requested range."
+            if len(periods) == 1:
+                # A range that ends in the past has nothing to follow
+                chunks = render_chart_chunks(bars, ticker, tickername, ma_period, interval, is_mobile, max_points, first,
+                                             live=end is None, revision=entry.get('revised_at'))
+            else:
+                chunks = render_sweep_chunks(bars, ticker, tickername, periods, interval, is_mobile, max_points, first,
+                                             heatmap=view == "heatmap")
+            body = _stream_chart(key, etag, encoding, chunks)
+        elif encoding in variants:
+            body = variants[encoding]
+        else:
+            body = compress.compress(variants[compress.IDENTITY], encoding)
+            chart_cache.cache.put(key, etag, {encoding: body})
+
+        response = Response(body, mimetype='text/html')
+        if encoding != compress.IDENTITY:
+            response.content_encoding = encoding
+        # Mobile and desktop pages differ for the same URL
+        response.vary.update(['User-Agent', 'Accept-Encoding'])
+        if variants is None:
+            # Headers go out before the page is rendered and it may still fail,
+            # so no validators or caching until it is complete in the chart cache
+            response.cache_control.no_store = True
+            return response
+        response = _cache_headers(response, variant, entry, interval)
+        return response.make_conditional(request)
+    except ValueError as e:
+        # Messages quote the query parameters, which must not run as markup
+        return f"Error: {html.escape(str(e))}", 400
+    except Exception as e:
+        print(f"Error in /chart: {e}")
+        return f"Error: {html.escape(str(e))}"
 
-        data = data.dropna()
+@app.route("/chart/stream")
+def chart_stream():
+    import live
+    try:
+        ticker = request.args.get("ticker", default="SPY").upper()
+        periods = _parse_ma(request.args.get("ma", default="200"))
+        if len(periods) != 1:
+            raise ValueError("Live updates take a single MA period")
+        ma_period = periods[0]
+        interval = request.args.get("interval", default="1d")
+        # EventSource sends the id of the last update it got when it reconnects
+        since = request.headers.get("Last-Event-ID", type=int) or request.args.get("since", type=int)
+        if since is None:
+            return "Error: since is required", 400
+        symbols.check(ticker, interval)
+    except ValueError as e:
+        return f"Error: {html.escape(str(e))}", 400
+
+    headers = {'Cache-Control': 'no-cache', 'X-Accel-Buffering': 'no'}
+    subscription = live.subscribe(ticker, interval, ma_period, since)
+    if subscription is None:
+        # Every stream slot in this worker is taken: ask the page to come back later
+        return Response(f"retry: {live.STREAM_MAX_SECONDS * 1000}\n\n", mimetype='text/event-stream', headers=headers)
+    return Response(live.events(ticker, interval, subscription), mimetype='text/event-stream', headers=headers)
+
+@app.route("/api/series")
+def series():
+    import bar_store, serialize
+    from indicators import add_indicators, add_sweep, warmup_bars
+    try:
+        # --- Get query parameters ---
+        ticker = request.args.get("ticker", default="SPY").upper()
+        periods = _parse_ma(request.args.get("ma", default="200"))
+        ma_period = periods[0]
+        interval = request.args.get("interval", default="1d")
+        fmt = request.args.get("format", default="json")
+        since = request.args.get("since", type=int)
+        start, end, lookback = _parse_span(request.args)
+        span = (start, end, lookback) if (start, end, lookback) != (None, None, None) else None
+        if fmt not in serialize.FORMATS:
+            return jsonify(error=f"Unknown format {fmt!r}"), 400
+        symbols.check(ticker, interval)
 
-        # Detect if it's a mobile request and set font sizes
-        user_agent = request.headers.get('User-Agent', '').lower()
-        is_mobile = any(x in user_agent for x in ['mobile', 'iphone', 'ipad', 'android'])
-        
-        # Adjust font sizes for mobile
-        title_size = 24 if is_mobile else 36
-        subtitle_size = 16 if is_mobile else 24
-        legend_size = 12 if is_mobile else 16
-
-        # Helper function to wrap long text for mobile
-        def wrap_text_for_mobile(text, max_length=25):
-            if len(text) <= max_length:
-                return text
-            # Find a good place to break (prefer spaces)
-            words = text.split()
-            lines = []
-            current_line = ""
-            
-            for word in words:
-                if len(current_line + " " + word) <= max_length:
-                    current_line += (" " + word) if current_line else word
-                else:
-                    if current_line:
-                        lines.append(current_line)
-                    current_line = word
-            
-            if current_line:
-                lines.append(current_line)
-            
-            return "<br>".join(lines)
-
-        # Format title for mobile vs desktop
-        mobile_title = wrap_text_for_mobile(tickername) if is_mobile else tickername
-
-        # --- Create Plotly chart with 3 rows ---
-        fig = make_subplots(
-            rows=3, cols=1,
-            shared_xaxes=True,
-            row_heights=[0.55, 0.225, 0.225] if is_mobile else [0.6, 0.2, 0.2],
-            vertical_spacing=0.08 if is_mobile else 0.05,
-            subplot_titles=("", "Normalized Momentum", "RSI (14-period)")
-        )
-        
-        # Update subplot title formatting
-        fig.update_annotations(
-            font=dict(
-                size=subtitle_size,
-                color='black',
-                weight='bold'
-            )
-        )
-        
-        # --- Row 1: Price & MA ---
-        fig.add_trace(
-            go.Scatter(x=data.index, y=data['Close'], name=f"{ticker} Close", line=dict(color='black', width=2)),
-            row=1, col=1
-        )
-        fig.add_trace(
-            go.Scatter(x=data.index, y=data['MA'], name=f"{ma_period}-Period MA", line=dict(color='blue', width=2, dash='dash')),
-            row=1, col=1
-        )
-
-        # --- Row 2: Momentum ---
-        fig.add_trace(
-            go.Scatter(x=data.index, y=data['Momentum'], name="Normalized Momentum", line=dict(color='darkred', width=2)),
-            row=2, col=1
-        )
-
-        # --- Row 3: RSI ---
-        fig.add_trace(
-            go.Scatter(x=data.index, y=data['RSI'], name="14-period RSI", line=dict(color='green', width=2)),
-            row=3, col=1
-        )
-
-        # --- Layout settings ---        
-        fig.update_layout(
-            title={
-                'text': f"<b>{mobile_title}</b>" if is_mobile else f"<b>{ticker} ({tickername})</b>",
-                'font': {
-                    'size': title_size,
-                    'color': 'black'
-                },
-                'x': 0.5,
-                'xanchor': 'center',
-                'y': 0.92 if is_mobile else 0.95,  # Moved down on mobile to avoid toolbar
-                'yanchor': 'top'
-            },
-            autosize=True,
-            height=None,
-            showlegend=True,
-            template="plotly_white",
-            hovermode='x unified',
-            legend=dict(
-                x=1.02 if not is_mobile else 0.5,
-                y=0.75 if not is_mobile else -0.15,  # Moved legend up from -0.25 to -0.15
-                xanchor='left' if not is_mobile else 'center',
-                yanchor='middle' if not is_mobile else 'top',
-                font=dict(size=legend_size),
-                bgcolor='rgba(255,255,255,0.95)' if is_mobile else 'rgba(255,255,255,0)',
-                bordercolor='gray' if is_mobile else 'black',
-                borderwidth=1 if is_mobile else 0,
-                orientation='h' if is_mobile else 'v'
-            ),
-            margin=dict(
-                t=120 if is_mobile else 100,
-                l=40,
-                r=40,
-                b=200 if is_mobile else 60  # Increased bottom margin even more
-            )
-        )
-
-        fig.update_xaxes(title_text="Date", row=3, col=1, title_font_size=12 if is_mobile else 14)
-        fig.update_yaxes(title_text="Price", row=1, col=1, title_font_size=12 if is_mobile else 14)
-        fig.update_yaxes(title_text="Momentum", row=2, col=1, title_font_size=12 if is_mobile else 14)
-        fig.update_yaxes(title_text="RSI", row=3, col=1, range=[0, 100], title_font_size=12 if is_mobile else 14)
-
-        print(f"Processing ticker={ticker}, ma={ma_period}, interval={interval}")
-
-        # --- Inject custom CSS to enlarge modebar buttons and optimize for mobile ---
-        mobile_css = """
-        <style>
-            html, body {
-                margin: 0;
-                padding: 0;
-                height: 100%;
-                overflow-x: hidden;
-            }
-            .modebar {
-                transform: scale(1.4);
-                transform-origin: top right;
-            }
-            .modebar-btn {
-                padding: 8px !important;
-                margin: 2px !important;
-            }
-            .plot-container {
-                height: 130vh !important;  /* Even taller for more bottom space */
-                min-height: 130vh !important;
-            }
-            .js-plotly-plot {
-                height: 130vh !important;
-            }
-            @media (max-width: 768px) {
-                .modebar {
-                    transform: scale(1.2);
-                }
-                .js-plotly-plot .plotly .modebar {
-                    left: 10px !important;
-                    right: auto !important;
-                }
-                .main-svg {
-                    overflow: visible !important;
-                }
-                body {
-                    overflow-y: auto !important;  /* Enable vertical scrolling */
-                }
-            }
-        </style>
-        """ if is_mobile else """
-        <style>
-            html, body {
-                margin: 0;
-                padding: 0;
-                height: 100%;
-            }
-            .modebar {
-                transform: scale(1.8);
-                transform-origin: top right;
-            }
-            .modebar-btn {
-                padding: 12px !important;
-                margin: 4px !important;
-            }
-            .plot-container {
-                height: 100vh !important;
+        # --- Fetch data ---
+        with metrics.stage('download'):
+            entry = bar_store.get_entry(ticker, interval)
+        if entry['bars'].dropna().empty:
+            return jsonify(error=f"No data found for {ticker}."), 404
+
+        key = ('series', ticker, tuple(periods), interval, since, span, fmt)
+        etag = chart_cache.make_etag(key, entry['version'], '')
+        if _not_modified(etag, entry):
+            return _cache_headers(Response(status=304), etag, entry, interval)
+
+        # Indicators need the history before `since`; only the response is cut to it
+        with metrics.stage('indicators'):
+            bars, first = entry['bars'].dropna(), None
+            if span is not None:
+                bars, first = bar_store.window(bars, warmup_bars(periods[-1]), start, end, lookback)
+            if len(periods) > 1:
+                # MA_<n>/Momentum_<n> for every period from one cumulative sum
+                data, columns = add_sweep(bars, periods)
+                columns = ['Close'] + columns
+            elif span is None:
+                data = add_indicators(bars, ma_period, series_key=(ticker, interval), revision=entry.get('revised_at'))
+                columns = serialize.SERIES_COLUMNS
+            else:
+                data = add_indicators(bars, ma_period)
+                columns = serialize.SERIES_COLUMNS
+            data = data.dropna()
+            if span is not None:
+                data = data[data.index >= first] if first is not None else data.iloc[:0]
+        if since is not None:
+            data = data[serialize.epoch_seconds(data.index) > since]
+
+        meta = {'ticker': ticker, 'interval': interval, 'ma': ma_period if len(periods) == 1 else periods}
+        with metrics.stage('serialize'):
+            body, mimetype, headers = serialize.encode_series(data, meta, fmt, columns)
+        response = Response(body, mimetype=mimetype, headers=headers)
+        return _cache_headers(response, etag, entry, interval)
+    except ValueError as e:
+        return jsonify(error=str(e)), 400
+    except Exception as e:
+        print(f"Error in /api/series: {e}")
+        return jsonify(error=str(e)), 500
+
+@app.route("/api/batch")
+def batch():
+    import numpy as np
+    import bar_store, serialize
+    from indicators import align_right, momentum_rsi
+    try:
+        # --- Get query parameters ---
+        tickers = [t.strip().upper() for t in request.args.get("tickers", default="").split(",") if t.strip()]
+        tickers = list(dict.fromkeys(tickers))
+        ma_period = int(request.args.get("ma", default=200))
+        interval = request.args.get("interval", default="1d")
+        with_series = request.args.get("series", default="0") not in ("0", "false", "")
+        since = request.args.get("since", type=int)
+        if not tickers:
+            return jsonify(error="tickers is required, e.g. tickers=SPY,QQQ"), 400
+        if len(tickers) > BATCH_MAX_TICKERS:
+            return jsonify(error=f"At most {BATCH_MAX_TICKERS} tickers per request"), 400
+        for ticker in tickers:
+            symbols.check(ticker, interval)
+
+        # --- Fetch data (stale tickers refresh in one bulk download) ---
+        with metrics.stage('download'):
+            entries = bar_store.get_entries(tickers, interval)
+        closes = {}
+        for ticker in tickers:
+            entry = entries.get(ticker)
+            if entry is not None:
+                close = entry['bars'].dropna()['Close']
+                if not close.empty:
+                    closes[ticker] = close
+        missing = [t for t in tickers if t not in closes]
+
+        # --- Indicators for every ticker in one pass over the aligned panel ---
+        with metrics.stage('indicators'):
+            panel = align_right(closes)
+            ma, momentum, rsi = momentum_rsi(panel, ma_period)
+
+        results = {}
+        for ticker, close in closes.items():
+            n = len(close)
+            column = {
+                'close': panel[ticker].to_numpy()[-n:],
+                'ma': ma[ticker].to_numpy()[-n:],
+                'momentum': momentum[ticker].to_numpy()[-n:],
+                'rsi': rsi[ticker].to_numpy()[-n:],
             }
-        </style>
-        """
-
-        # Inject CSS into HTML head
-        html = pio.to_html(fig, include_plotlyjs='cdn', full_html=True, default_height='100%', default_width='100%')
-        html = html.replace('</head>', mobile_css + '</head>')
+            t = serialize.epoch_seconds(close.index)
+            valid = ~np.isnan(column['ma']) & ~np.isnan(column['rsi'])
+            if not valid.any():
+                missing.append(ticker)
+                continue
+            last = np.flatnonzero(valid)[-1]
+            result = {'t': int(t[last])}
+            result.update({name: float(values[last]) for name, values in column.items()})
+            if with_series:
+                keep = valid if since is None else valid & (t > since)
+                result['series'] = {'t': t[keep].tolist()}
+                result['series'].update({name: values[keep].tolist() for name, values in column.items()})
+            results[ticker] = result
+
+        return jsonify(interval=interval, ma=ma_period, tickers=results, missing=missing)
+    except ValueError as e:
+        return jsonify(error=str(e)), 400
+    except Exception as e:
+        print(f"Error in /api/batch: {e}")
+        return jsonify(error=str(e)), 500
 
-        return Response(html, mimetype='text/html')
+@app.route("/api/screen")
+def screen():
+    import screener
+    try:
+        # --- Get query parameters ---
+        interval = request.args.get("interval", default="1d")
+        ma_period = int(request.args.get("ma", default=200))
+        sort = request.args.get("sort", default="-momentum")
+        limit = int(request.args.get("limit", default=50))
+        above_ma = request.args.get("above_ma")
+        if above_ma is not None:
+            above_ma = above_ma not in ("0", "false", "")
+        ranges = {name: float(request.args[name]) for name in screener.RANGE_FILTERS if name in request.args}
+        if interval not in screener.SCREEN_INTERVALS or ma_period not in screener.SCREEN_MA:
+            return jsonify(error=f"Screens are kept for interval in {screener.SCREEN_INTERVALS} "
+                                 f"and ma in {screener.SCREEN_MA}"), 400
+
+        # --- Read the precomputed ranking ---
+        run = screener.status(interval)
+        if run is None:
+            return jsonify(error=f"No {interval} screen yet; it is built by the scheduler or "
+                                 f"python screener.py --refresh"), 503
+        with metrics.stage('screen'):
+            results = screener.query(interval, ma_period, sort, limit, above_ma, **ranges)
+        return jsonify(interval=interval, ma=ma_period, updated_at=run['updated_at'],
+                       universe=run['tickers'], results=results)
+    except ValueError as e:
+        return jsonify(error=str(e)), 400
     except Exception as e:
-        print(f"Error in /chart: {e}")
-        return f"Error: {e}"
+        print(f"Error in /api/screen: {e}")
+        return jsonify(error=str(e)), 500
 
 if __name__ == '__main__':
     app.run(debug=True)
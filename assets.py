@@ -0,0 +1,59 @@
+'''
+Self-hosted plotly.js, served under a content-fingerprinted URL.
+
+Chart pages reference /assets/plotly-<hash>.min.js instead of the CDN, so the
+library is fetched once per client and then reused from the browser cache for
+good: any change to the bundle changes the URL.
+
+The bundle shipped with the plotly Python package is used by default. Set
+PLOTLYJS_PATH to serve a smaller build instead, e.g. a custom partial bundle
+with only the scatter trace type.
+
+Compressed copies of the bundle are built once per encoding and kept in memory.
+'''
+
+import hashlib
+import os
+import threading
+
+import compress
+
+PLOTLYJS_PATH = os.environ.get('PLOTLYJS_PATH')
+
+# Fingerprinted URLs never change content, so clients can keep them for a year
+IMMUTABLE_CACHE_CONTROL = 'public, max-age=31536000, immutable'
+
+_bundle = None
+_encoded = {}
+_lock = threading.Lock()
+
+
+def plotlyjs():
+    '''Return (filename, bytes) of the plotly.js bundle, loading it on first use.'''
+    global _bundle
+    with _lock:
+        if _bundle is None:
+            if PLOTLYJS_PATH:
+                with open(PLOTLYJS_PATH, 'rb') as f:
+                    body = f.read()
+            else:
+                import plotly.offline
+                body = plotly.offline.get_plotlyjs().encode()
+            digest = hashlib.sha256(body).hexdigest()[:12]
+            _bundle = (f"plotly-{digest}.min.js", body)
+        return _bundle
+
+
+def plotlyjs_url():
+    return f"/assets/{plotlyjs()[0]}"
+
+
+def plotlyjs_encoded(encoding):
+    '''The bundle bytes in the given Content-Encoding, compressed on first use.'''
+    body = plotlyjs()[1]
+    if encoding == compress.IDENTITY:
+        return body
+    with _lock:
+        if encoding not in _encoded:
+            _encoded[encoding] = compress.compress(body, encoding)
+        return _encoded[encoding]
@@ -0,0 +1,405 @@
+'''
+On-disk OHLCV bar cache keyed by (ticker, interval).
+
+Stored history is served as-is while it is fresh; once it goes stale only the
+bars from the last stored timestamp onwards are requested from upstream and
+merged onto the tail.
+
+With RESAMPLE_FROM_DAILY (the default) only daily bars are downloaded; weekly
+and monthly bars are aggregated from them when the daily bars change and kept
+under bars/derived, so the three views of a ticker share one download.
+
+Series are stored as columnar files (see columnar.py) that every worker maps
+read-only, so gunicorn workers share one copy of each history in the page
+cache instead of holding a pandas copy each. A refresh writes a new file and
+moves it into place; readers remap when the file changes.
+'''
+
+import hashlib
+import os
+import threading
+import time
+from collections import OrderedDict
+from contextlib import ExitStack, contextmanager
+
+import pandas as pd
+
+import columnar
+import metrics
+import symbols
+import upstream
+from providers import OHLCV_COLUMNS, get_provider
+from resample import PERIODS, resample_ohlcv
+
+try:
+    import fcntl
+except ImportError:  # Windows dev boxes: in-process single flight only
+    fcntl = None
+
+CACHE_DIR = os.environ.get('CACHE_DIR', os.path.join(os.path.dirname(os.path.abspath(__file__)), '.cache'))
+BAR_DIR = os.path.join(CACHE_DIR, 'bars')
+DERIVED_DIR = os.path.join(BAR_DIR, 'derived')
+
+# Stored dtypes besides float32: volumes pass 2**24, where float32 stops
+# holding whole numbers, and weekly/monthly sums add them up
+COLUMN_DTYPES = {'Volume': '<f8'}
+
+# Seconds a stored series is served before the tail is refreshed from upstream
+STALENESS = {
+    '1d': int(os.environ.get('BAR_STALENESS_1D', 15 * 60)),
+    '1wk': int(os.environ.get('BAR_STALENESS_1WK', 60 * 60)),
+    '1mo': int(os.environ.get('BAR_STALENESS_1MO', 6 * 60 * 60)),
+}
+DEFAULT_STALENESS = 15 * 60
+
+RESAMPLE_FROM_DAILY = os.environ.get('RESAMPLE_FROM_DAILY', '1') != '0'
+
+# Seconds after which the whole history is downloaded again, so splits and
+# corrections to old bars eventually make it into the store
+FULL_REFRESH = int(os.environ.get('BAR_FULL_REFRESH', 7 * 24 * 60 * 60))
+
+# Series kept mapped per process, weekly and monthly ones included; each
+# mapping holds a file descriptor
+BAR_CACHE_SIZE = int(os.environ.get('BAR_CACHE_SIZE', 128))
+
+_memory = OrderedDict()  # path -> ((inode, mtime_ns), entry, mapping), least recently used first
+_memory_lock = threading.Lock()
+
+
+def staleness(interval):
+    '''Seconds bars for interval are served before a refresh.'''
+    if RESAMPLE_FROM_DAILY and interval in PERIODS:
+        interval = '1d'
+    return STALENESS.get(interval, DEFAULT_STALENESS)
+
+
+def _path(ticker, interval):
+    # Every file name in the store goes through here
+    symbols.check(ticker, interval)
+    return os.path.join(BAR_DIR, f"{ticker}_{interval}.bars")
+
+
+@contextmanager
+def file_lock(path):
+    '''Exclusive lock on path + '.lock', held across gunicorn worker processes.'''
+    if fcntl is None:
+        yield
+        return
+    os.makedirs(os.path.dirname(path), exist_ok=True)
+    with open(path + '.lock', 'a') as f:
+        fcntl.flock(f, fcntl.LOCK_EX)
+        try:
+            yield
+        finally:
+            fcntl.flock(f, fcntl.LOCK_UN)
+
+
+def _read(path):
+    try:
+        st = os.stat(path)
+    except FileNotFoundError:
+        return None
+    # os.replace() gives the new file a new inode even within one mtime tick
+    stamp = (st.st_ino, st.st_mtime_ns)
+    with _memory_lock:
+        cached = _memory.get(path)
+        if cached is not None and cached[0] == stamp:
+            _memory.move_to_end(path)
+            return cached[1]
+    bars, meta, mapping = columnar.read(path)
+    entry = {'bars': bars, **meta}
+    with _memory_lock:
+        # A replaced file's old mapping goes too
+        dropped = [_memory.pop(path)] if path in _memory else []
+        _memory[path] = (stamp, entry, mapping)
+        while len(_memory) > BAR_CACHE_SIZE:
+            dropped.append(_memory.popitem(last=False)[1])
+    for _, _, old in dropped:
+        _unmap(old)
+    return entry
+
+
+def _unmap(mapping):
+    try:
+        mapping.close()
+    except BufferError:
+        # A request still holds views of it; it is unmapped when the last one goes
+        pass
+
+
+def _write(path, entry):
+    columnar.write(path, entry['bars'], {k: v for k, v in entry.items() if k != 'bars'}, COLUMN_DTYPES)
+    # Serve the mapped file from now on, not the downloaded frame, so this
+    # worker shares the pages with the others too
+    return _read(path)
+
+
+def _merge(old, new):
+    if new.empty:
+        return old
+    return pd.concat([old[old.index < new.index[0]], new])
+
+
+def _version(bars):
+    # Cheap fingerprint: a new bar or a revised last bar changes it
+    # float32, as prices are stored, so downloaded and re-read bars give the same fingerprint
+    last = bars.iloc[-1].to_numpy(dtype='float32', na_value=float('nan')).tobytes()
+    return hashlib.sha1(f"{len(bars)}:{bars.index[-1].value}".encode() + last).hexdigest()[:16]
+
+
+def _needs_full(entry, now):
+    return entry is None or entry['bars'].empty or now - entry['full_at'] >= FULL_REFRESH
+
+
+def _revised_at(old, bars, now):
+    # When a close before the last stored bar last changed: the incremental
+    # indicator engine takes everything but the last bar as final until this moves
+    if old is None or old['bars'].empty:
+        return now
+    before = old['bars']['Close'].iloc[:-1]
+    after = bars['Close'].reindex(before.index)
+    # float32, as stored, like _version()
+    if before.astype('float32').equals(after.astype('float32')):
+        return old.get('revised_at', old['full_at'])
+    return now
+
+
+def _save(path, old, bars, now, full_at):
+    if bars.empty:
+        # Don't persist misses; an unknown ticker should not poison the store
+        return {'bars': bars, 'fetched_at': now, 'changed_at': now, 'revised_at': now, 'version': None}
+
+    version = _version(bars)
+    if old is not None and old.get('version') == version:
+        changed_at = old['changed_at']
+    else:
+        changed_at = now
+    entry = {'bars': bars, 'fetched_at': now, 'full_at': full_at, 'changed_at': changed_at,
+             'revised_at': _revised_at(old, bars, now), 'version': version}
+    return _write(path, entry)
+
+
+def _refresh(path, ticker, interval, max_age):
+    # Serializes refreshes of one series across workers
+    with file_lock(path):
+        # Another worker may have refreshed while we waited for the lock
+        now = time.time()
+        entry = _read(path)
+        if entry is not None and now - entry['fetched_at'] < max_age:
+            return entry
+
+        try:
+            if _needs_full(entry, now):
+                bars = get_provider().download(ticker, interval)
+                full_at = now
+            else:
+                # Re-request the last stored bar too: it may have been partial when stored
+                last = entry['bars'].index[-1]
+                tail = get_provider().download(ticker, interval, start=last.strftime('%Y-%m-%d'))
+                bars = _merge(entry['bars'], tail)
+                full_at = entry['full_at']
+        except Exception as e:
+            metrics.upstream_errors.inc(source='bars', kind='error')
+            if entry is None:
+                raise
+            print(f"Bar refresh failed for {ticker} {interval}, serving cached bars: {e}")
+            return entry
+
+        return _save(path, entry, bars, now, full_at)
+
+
+def _resampled(ticker, interval, daily):
+    # Written once per change of the daily bars and mapped like them, so
+    # workers share the weekly and monthly bars too rather than each
+    # aggregating its own copy
+    if daily is None:
+        return None
+    if daily['version'] is None:
+        # A miss: nothing stored to derive from
+        return {**daily, 'bars': resample_ohlcv(daily['bars'], interval)}
+    version = f"{daily['version']}:{interval}"
+    path = os.path.join(DERIVED_DIR, f"{ticker}_{interval}.bars")
+    derived = _read(path)
+    if derived is None or derived['version'] != version:
+        with file_lock(path):
+            # Another worker may have written it while we waited for the lock
+            derived = _read(path)
+            if derived is None or derived['version'] != version:
+                columnar.write(path, resample_ohlcv(daily['bars'], interval), {'version': version}, COLUMN_DTYPES)
+                derived = _read(path)
+    return {**daily, **derived}
+
+
+def get_entry(ticker, interval):
+    '''Return {'bars', 'fetched_at', 'changed_at', 'revised_at', 'version'} for (ticker, interval).
+
+    The tail is refreshed from upstream first if the stored series is stale.
+    Concurrent callers for the same series share a single refresh.
+    '''
+    if RESAMPLE_FROM_DAILY and interval in PERIODS:
+        return _resampled(ticker, interval, get_entry(ticker, '1d'))
+
+    path = _path(ticker, interval)
+    max_age = staleness(interval)
+
+    entry = _read(path)
+    if entry is not None and time.time() - entry['fetched_at'] < max_age:
+        metrics.cache_requests.inc(cache='bars', result='hit')
+        return entry
+
+    metrics.cache_requests.inc(cache='bars', result='miss')
+    try:
+        return upstream.fetch(('bars', ticker, interval), _refresh, path, ticker, interval, max_age)
+    except TimeoutError:
+        metrics.upstream_errors.inc(source='bars', kind='timeout')
+        if entry is None:
+            raise
+        # The refresh keeps running and will update the store when it lands
+        print(f"Bar refresh slow for {ticker} {interval}, serving cached bars")
+        return entry
+
+
+# Stands in for tickers a bulk download left out; keeps the OHLCV columns so
+# callers see an empty series rather than a missing 'Close'
+_EMPTY = pd.DataFrame(columns=OHLCV_COLUMNS, dtype='float64')
+
+
+def _refresh_many(stale, interval, max_age):
+    # Takes every series' lock, in one order so overlapping batches can't
+    # deadlock, then re-checks each: another worker may have refreshed some
+    # while we waited, and only the rest are downloaded
+    with ExitStack() as locks:
+        for ticker in sorted(stale):
+            locks.enter_context(file_lock(_path(ticker, interval)))
+        now = time.time()
+        current = {ticker: _read(_path(ticker, interval)) for ticker in stale}
+        fresh = {ticker: entry for ticker, entry in current.items()
+                 if entry is not None and now - entry['fetched_at'] < max_age}
+        still_stale = {ticker: entry for ticker, entry in current.items() if ticker not in fresh}
+        if still_stale:
+            fresh.update(_download_many(still_stale, interval, now))
+        return fresh
+
+
+def _download_many(stale, interval, now):
+    full = [ticker for ticker, entry in stale.items() if _needs_full(entry, now)]
+    tail = [ticker for ticker in stale if ticker not in full]
+    provider = get_provider()
+    result = {}
+    try:
+        # One bulk request for series missing from the store, one for tails
+        # starting at the oldest last-stored bar among them
+        downloaded = provider.download_many(full, interval) if full else {}
+        if tail:
+            start = min(stale[ticker]['bars'].index[-1] for ticker in tail)
+            tails = provider.download_many(tail, interval, start=start.strftime('%Y-%m-%d'))
+        else:
+            tails = {}
+    except Exception as e:
+        metrics.upstream_errors.inc(source='bars', kind='error')
+        print(f"Batch bar refresh failed for {interval}, serving cached bars: {e}")
+        return {ticker: entry for ticker, entry in stale.items() if entry is not None}
+
+    for ticker, entry in stale.items():
+        path = _path(ticker, interval)
+        if ticker in full:
+            result[ticker] = _save(path, entry, downloaded.get(ticker, _EMPTY), now, now)
+        else:
+            bars = _merge(entry['bars'], tails.get(ticker, _EMPTY))
+            result[ticker] = _save(path, entry, bars, now, entry['full_at'])
+    return result
+
+
+def get_entries(tickers, interval, max_age=None):
+    '''Like get_entry() for many tickers, refreshing all stale ones in bulk upstream calls.
+
+    max_age overrides the configured staleness, e.g. to force a refresh of
+    everything fetched before the last market close.
+    '''
+    if RESAMPLE_FROM_DAILY and interval in PERIODS:
+        daily = get_entries(tickers, '1d', max_age=max_age)
+        return {ticker: _resampled(ticker, interval, entry) for ticker, entry in daily.items()}
+
+    if max_age is None:
+        max_age = staleness(interval)
+    now = time.time()
+    entries = {}
+    stale = {}
+    for ticker in tickers:
+        entry = _read(_path(ticker, interval))
+        if entry is not None and now - entry['fetched_at'] < max_age:
+            entries[ticker] = entry
+        else:
+            stale[ticker] = entry
+
+    metrics.cache_requests.inc(len(entries), cache='bars', result='hit')
+    if stale:
+        metrics.cache_requests.inc(len(stale), cache='bars', result='miss')
+        key = ('bars-many', interval, tuple(sorted(stale)))
+        try:
+            entries.update(upstream.fetch(key, _refresh_many, stale, interval, max_age))
+        except TimeoutError:
+            metrics.upstream_errors.inc(source='bars', kind='timeout')
+            print(f"Batch bar refresh slow for {interval}, serving cached bars")
+            entries.update({ticker: entry for ticker, entry in stale.items() if entry is not None})
+    return entries
+
+
+def stored_tickers(interval):
+    '''Tickers with bars for interval in the store, without touching upstream.'''
+    if RESAMPLE_FROM_DAILY and interval in PERIODS:
+        interval = '1d'
+    suffix = f"_{interval}.bars"
+    try:
+        names = os.listdir(BAR_DIR)
+    except FileNotFoundError:
+        return []
+    return sorted(name[:-len(suffix)] for name in names if name.endswith(suffix))
+
+
+def stored(ticker, interval):
+    '''The stored entry for (ticker, interval) however old it is, or None; never refreshes.
+
+    Read straight from the file, past the per-process caches, so a scan over
+    the whole store doesn't keep every series mapped.
+    '''
+    if RESAMPLE_FROM_DAILY and interval in PERIODS:
+        daily = stored(ticker, '1d')
+        return None if daily is None else {**daily, 'bars': resample_ohlcv(daily['bars'], interval)}
+    try:
+        bars, meta, _ = columnar.read(_path(ticker, interval))
+    except FileNotFoundError:
+        return None
+    return {'bars': bars, **meta}
+
+
+def window(bars, warmup, start=None, end=None, lookback=None):
+    '''Cut bars to the requested range plus warmup earlier bars for the indicators.
+
+    The range is [start, end]; without start it is the last `lookback` bars
+    (an int) or the span `lookback` (a pd.DateOffset) back from the last bar,
+    and without either it is the whole history. Returns (bars, first) where
+    first is the timestamp of the first bar in the range, or None if the range
+    holds no bars.
+    '''
+    bars = bars.dropna()
+    if end is not None:
+        bars = bars[bars.index <= end]
+    if bars.empty:
+        return bars, None
+    if start is not None:
+        first = int(bars.index.searchsorted(start))
+    elif isinstance(lookback, int):
+        first = max(0, len(bars) - lookback)
+    elif lookback is not None:
+        first = int(bars.index.searchsorted(bars.index[-1] - lookback, side='right'))
+    else:
+        first = 0
+    if first >= len(bars):
+        return bars.iloc[:0], None
+    return bars.iloc[max(0, first - warmup):], bars.index[first]
+
+
+def get_bars(ticker, interval):
+    '''Return the full OHLCV history for (ticker, interval), refreshing the tail if stale.'''
+    return get_entry(ticker, interval)['bars']
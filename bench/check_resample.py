@@ -0,0 +1,64 @@
+'''
+Compare weekly/monthly bars resampled from daily against Yahoo's own.
+
+Downloads 1d, 1wk and 1mo history from Yahoo for each ticker, builds weekly
+and monthly bars with resample.resample_ohlcv() and matches them period by
+period (Yahoo dates weekly bars by the Monday and monthly bars by the 1st;
+ours by the last trading day). Prints, per ticker and interval, how many
+periods agree within --rtol on each column and the worst relative error.
+Needs network access.
+
+    python bench/check_resample.py [--tickers SPY,QQQ,GLD,AAPL] [--rtol 1e-6]
+'''
+
+import argparse
+import os
+import sys
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import numpy as np
+
+from providers import OHLCV_COLUMNS, YFinanceProvider
+from resample import PERIODS, resample_ohlcv
+
+
+def compare(ours, theirs, interval, rtol):
+    '''Return {column: (matching periods, compared periods, max relative error)}.'''
+    ours = ours.set_axis(ours.index.to_period(PERIODS[interval]))
+    theirs = theirs.set_axis(theirs.index.to_period(PERIODS[interval]))
+    # The current period is still forming on one side or the other
+    common = ours.index.intersection(theirs.index)[:-1]
+    result = {}
+    for column in OHLCV_COLUMNS:
+        if column not in ours or column not in theirs:
+            continue
+        a = ours.loc[common, column].to_numpy(dtype=np.float64)
+        b = theirs.loc[common, column].to_numpy(dtype=np.float64)
+        valid = ~np.isnan(a) & ~np.isnan(b)
+        error = np.abs(a[valid] - b[valid]) / np.maximum(np.abs(b[valid]), 1e-12)
+        result[column] = (int((error <= rtol).sum()), int(valid.sum()), float(error.max()) if len(error) else 0.0)
+    return result
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--tickers', default='SPY,QQQ,GLD,AAPL')
+    parser.add_argument('--rtol', type=float, default=1e-6)
+    args = parser.parse_args()
+
+    provider = YFinanceProvider()
+    for ticker in args.tickers.split(','):
+        daily = provider.download(ticker, '1d')
+        if daily.empty:
+            print(f"{ticker:6s} no daily data from upstream")
+            continue
+        for interval in PERIODS:
+            theirs = provider.download(ticker, interval)
+            ours = resample_ohlcv(daily, interval)
+            for column, (ok, total, worst) in compare(ours, theirs, interval, args.rtol).items():
+                print(f"{ticker:6s} {interval:4s} {column:10s} {ok:6d}/{total:<6d} max rel err {worst:.2e}")
+
+
+if __name__ == '__main__':
+    sys.exit(main())
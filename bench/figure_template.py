@@ -0,0 +1,97 @@
+'''
+Per-request CPU of turning indicator data into a chart page.
+
+    plotly  - figure.build_figure() + pio.to_html(), the original path
+    fast    - figure.chart_figure() + figure.render_page(): cached layout
+              skeleton, typed-array traces, epoch-ms dates
+
+Also checks that the fast path carries the same layout and the same data.
+
+    python bench/figure_template.py [--bars 8000] [--repeat 20]
+'''
+
+import argparse
+import base64
+import os
+import sys
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import numpy as np
+import plotly.io as pio
+
+import figure
+from indicators import add_indicators
+from providers import RandomWalkProvider
+
+
+def timed(fn, repeat):
+    samples = []
+    for _ in range(repeat):
+        start = time.perf_counter()
+        result = fn()
+        samples.append(time.perf_counter() - start)
+    samples.sort()
+    return samples[len(samples) // 2], result
+
+
+def decode(spec):
+    return np.frombuffer(base64.b64decode(spec['bdata']), dtype='<f8')
+
+
+def check(traces, title, is_mobile):
+    reference = figure.build_figure(traces, title, is_mobile).to_dict()
+    fast = figure.chart_figure(traces, title, is_mobile)
+    for name, axis in fast['layout'].items():
+        expected = reference['layout'][name]
+        if name.startswith('xaxis'):
+            expected = dict(expected, type='date')
+        if axis != expected:
+            sys.exit(f"layout.{name} differs from build_figure")
+    for (x, y, name), trace in zip(traces, fast['data']):
+        if trace['name'] != name:
+            sys.exit(f"trace name {trace['name']!r} != {name!r}")
+        if not np.array_equal(decode(trace['x']), x.values.astype('datetime64[ms]').astype(np.int64)):
+            sys.exit(f"{name}: x values differ")
+        if not np.array_equal(decode(trace['y']), y.to_numpy(dtype=np.float64), equal_nan=True):
+            sys.exit(f"{name}: y values differ")
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--bars', type=int, default=8000)
+    parser.add_argument('--repeat', type=int, default=20)
+    args = parser.parse_args()
+
+    data = add_indicators(RandomWalkProvider(bars=args.bars).download('SPY', '1d'), 36).dropna()
+    traces = [
+        (data.index, data['Close'], "SPY Close"),
+        (data.index, data['MA'], "36-Period MA"),
+        (data.index, data['Momentum'], "Normalized Momentum"),
+        (data.index, data['RSI'], "14-period RSI"),
+    ]
+    figure.warm()
+
+    for is_mobile in (False, True):
+        title = figure.chart_title('SPY', 'SPDR S&P 500 ETF Trust', is_mobile)
+        css = figure.MOBILE_CSS if is_mobile else figure.DESKTOP_CSS
+        device = 'mobile' if is_mobile else 'desktop'
+        check(traces, title, is_mobile)
+
+        def plotly_path():
+            html = pio.to_html(figure.build_figure(traces, title, is_mobile), include_plotlyjs='cdn',
+                               full_html=True, default_height='100%', default_width='100%')
+            return html.replace('</head>', css + '</head>').encode()
+
+        def fast_path():
+            return figure.render_page(figure.chart_figure(traces, title, is_mobile), css, '/assets/plotly.min.js')
+
+        slow, slow_html = timed(plotly_path, args.repeat)
+        fast, fast_html = timed(fast_path, args.repeat)
+        print(f"{device:8} bars={len(data):6}  plotly {slow * 1000:7.1f} ms {len(slow_html) / 1e3:7.0f} kB"
+              f"  fast {fast * 1000:6.1f} ms {len(fast_html) / 1e3:7.0f} kB  ({slow / fast:.0f}x)")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,138 @@
+'''
+Throughput of the app under gunicorn, default settings vs gunicorn.conf.py.
+
+Each profile starts a fresh server on the synthetic data provider with an
+empty cache directory. SYNTHETIC_LATENCY makes every download sleep, standing
+in for a slow yf.download, and requests are spread over many tickers so some
+of them miss the bar cache while others are quick re-renders. Cached bars go
+stale after --staleness seconds so downloads keep happening during the run.
+
+    python bench/loadtest.py [--clients 16] [--duration 20] [--latency 1.0]
+    python bench/loadtest.py --url http://localhost:8000   # an already running server
+'''
+
+import argparse
+import os
+import random
+import shutil
+import socket
+import subprocess
+import sys
+import tempfile
+import threading
+import time
+import urllib.error
+import urllib.request
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+PROFILES = {
+    'default': ['gunicorn', 'app:app'],
+    'tuned': ['gunicorn', '-c', 'gunicorn.conf.py', 'app:app'],
+}
+
+
+def free_port():
+    with socket.socket() as s:
+        s.bind(('127.0.0.1', 0))
+        return s.getsockname()[1]
+
+
+def wait_ready(url, timeout=60):
+    deadline = time.time() + timeout
+    while time.time() < deadline:
+        try:
+            urllib.request.urlopen(url + '/', timeout=2).read()
+            return
+        except (urllib.error.URLError, ConnectionError, OSError):
+            time.sleep(0.2)
+    raise RuntimeError(f"server at {url} did not come up")
+
+
+def start_server(profile, port, args, cache_dir):
+    env = dict(os.environ)
+    env.update({
+        'DATA_PROVIDER': 'synthetic',
+        'SYNTHETIC_BARS': str(args.bars),
+        'SYNTHETIC_LATENCY': str(args.latency),
+        'BAR_STALENESS_1D': str(args.staleness),
+        'CACHE_DIR': cache_dir,
+        'PORT': str(port),
+    })
+    command = PROFILES[profile] + ['--bind', f"127.0.0.1:{port}"]
+    return subprocess.Popen(command, cwd=ROOT, env=env,
+                            stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL)
+
+
+def run_clients(url, args):
+    '''Hammer url with args.clients threads for args.duration seconds.'''
+    tickers = [f"T{i:03d}" for i in range(args.tickers)]
+    latencies, errors = [], []
+    lock = threading.Lock()
+    stop = time.time() + args.duration
+
+    def client(seed):
+        rng = random.Random(seed)
+        while time.time() < stop:
+            query = f"/chart?ticker={rng.choice(tickers)}&ma={rng.choice([20, 50, 200])}&interval=1d"
+            start = time.perf_counter()
+            try:
+                with urllib.request.urlopen(url + query, timeout=120) as response:
+                    response.read()
+                ok = True
+            except (urllib.error.URLError, ConnectionError, OSError):
+                ok = False
+            elapsed = time.perf_counter() - start
+            with lock:
+                (latencies if ok else errors).append(elapsed)
+
+    threads = [threading.Thread(target=client, args=(i,)) for i in range(args.clients)]
+    for t in threads:
+        t.start()
+    for t in threads:
+        t.join()
+    return sorted(latencies), errors
+
+
+def report(name, latencies, errors, duration):
+    def pct(p):
+        return latencies[min(len(latencies) - 1, int(p * len(latencies)))] * 1000 if latencies else float('nan')
+    print(f"{name:8s} {len(latencies) / duration:7.1f} req/s  "
+          f"p50 {pct(0.50):7.0f} ms  p95 {pct(0.95):7.0f} ms  p99 {pct(0.99):7.0f} ms  "
+          f"ok {len(latencies)}  errors {len(errors)}")
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--url', help='test this server instead of starting the profiles')
+    parser.add_argument('--profiles', default='default,tuned')
+    parser.add_argument('--clients', type=int, default=16)
+    parser.add_argument('--duration', type=float, default=20)
+    parser.add_argument('--tickers', type=int, default=40, help='distinct tickers in the request mix')
+    parser.add_argument('--latency', type=float, default=1.0, help='seconds per synthetic download')
+    parser.add_argument('--staleness', type=int, default=10, help='seconds before cached bars are refreshed')
+    parser.add_argument('--bars', type=int, default=5000)
+    args = parser.parse_args()
+
+    if args.url:
+        latencies, errors = run_clients(args.url.rstrip('/'), args)
+        report('server', latencies, errors, args.duration)
+        return
+
+    for profile in args.profiles.split(','):
+        port = free_port()
+        cache_dir = tempfile.mkdtemp(prefix=f"loadtest-{profile}-")
+        server = start_server(profile, port, args, cache_dir)
+        try:
+            url = f"http://127.0.0.1:{port}"
+            wait_ready(url)
+            latencies, errors = run_clients(url, args)
+            report(profile, latencies, errors, args.duration)
+        finally:
+            server.terminate()
+            server.wait()
+            shutil.rmtree(cache_dir, ignore_errors=True)
+
+
+if __name__ == '__main__':
+    sys.exit(main())
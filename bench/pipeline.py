@@ -0,0 +1,190 @@
+'''
+Stage-by-stage benchmark of the /chart pipeline on synthetic history.
+
+For every combination of --bars, --devices and --ma the stages of a chart
+request run --repeat times each:
+
+    fetch       - bar_store.get_entry() reading the stored series from disk
+    indicators  - add_indicators() over the full history (no incremental cache)
+    downsample  - LTTB of the four traces (mobile default of MOBILE_MAX_POINTS)
+    figure      - figure.chart_figure() from the cached layout skeleton
+    html        - page head and body bytes
+    gzip        - the page compressed as it would be sent
+
+Reported per stage: p50/p95/p99 latency, peak traced memory (one extra run
+under tracemalloc, so it doesn't slow the timed runs) and output size.
+
+    python bench/pipeline.py [--bars 1000,10000,100000] [--ma 20,50,200] [--repeat 20]
+    python bench/pipeline.py --out before.json
+    python bench/pipeline.py --out after.json --compare before.json
+'''
+
+import argparse
+import json
+import os
+import platform
+import shutil
+import subprocess
+import sys
+import tempfile
+import time
+import tracemalloc
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+# Must be set before bar_store is imported
+os.environ['CACHE_DIR'] = tempfile.mkdtemp(prefix='bench-pipeline-')
+
+import numpy as np
+import pandas as pd
+
+import bar_store
+import compress
+import figure
+from downsample import lttb_series
+from indicators import add_indicators
+from providers import RandomWalkProvider, set_provider
+
+MOBILE_MAX_POINTS = int(os.environ.get('MOBILE_MAX_POINTS', 1000))
+STAGES = ('fetch', 'indicators', 'downsample', 'figure', 'html', 'gzip')
+
+
+def size_of(value):
+    '''Bytes of a stage's output; None for the figure dict, which has no cheap size.'''
+    if isinstance(value, bytes):
+        return len(value)
+    if isinstance(value, pd.DataFrame):
+        return int(value.memory_usage(index=True).sum())
+    if isinstance(value, pd.Series):
+        return int(value.memory_usage(index=True))
+    if isinstance(value, list):
+        return sum(size_of(v) for v in value)
+    return None
+
+
+def pipeline(ticker, ma_period, is_mobile):
+    '''The chart() stages as a list of (name, fn) where fn takes the previous result.'''
+    max_points = MOBILE_MAX_POINTS if is_mobile else None
+    css = figure.MOBILE_CSS if is_mobile else figure.DESKTOP_CSS
+
+    def fetch(_):
+        bar_store._memory.clear()
+        return bar_store.get_entry(ticker, '1d')['bars']
+
+    def indicators(bars):
+        return add_indicators(bars.dropna(), ma_period).dropna()
+
+    def downsample(data):
+        return [lttb_series(data[column], max_points) for column in ('Close', 'MA', 'Momentum', 'RSI')]
+
+    def build(series):
+        names = [f"{ticker} Close", f"{ma_period}-Period MA", "Normalized Momentum", "14-period RSI"]
+        traces = [(s.index, s, name) for s, name in zip(series, names)]
+        return figure.chart_figure(traces, figure.chart_title(ticker, ticker, is_mobile), is_mobile)
+
+    def html(fig):
+        div_id = figure.new_div_id()
+        return figure.page_head(css, '/assets/plotly.min.js', div_id) + b''.join(figure.page_body(fig, div_id))
+
+    def gzip(page):
+        return compress.compress(page, 'gzip')
+
+    return list(zip(STAGES, (fetch, indicators, downsample, build, html, gzip)))
+
+
+def percentile(samples, p):
+    return float(np.percentile(samples, p)) * 1000
+
+
+def run_case(bars, is_mobile, ma_period, repeat):
+    ticker = f"SYN{bars}"
+    stages = pipeline(ticker, ma_period, is_mobile)
+    rows = []
+    value = None
+    for name, fn in stages:
+        previous = value
+        samples = []
+        for _ in range(repeat):
+            start = time.perf_counter()
+            value = fn(previous)
+            samples.append(time.perf_counter() - start)
+        tracemalloc.start()
+        fn(previous)
+        _, peak = tracemalloc.get_traced_memory()
+        tracemalloc.stop()
+        rows.append({
+            'bars': bars, 'device': 'mobile' if is_mobile else 'desktop', 'ma': ma_period, 'stage': name,
+            'p50_ms': percentile(samples, 50), 'p95_ms': percentile(samples, 95),
+            'p99_ms': percentile(samples, 99), 'peak_kb': peak / 1024, 'size_bytes': size_of(value),
+        })
+    return rows
+
+
+def git_commit():
+    try:
+        return subprocess.run(['git', 'rev-parse', '--short', 'HEAD'], cwd=ROOT,
+                              capture_output=True, text=True, check=True).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+
+def row_key(row):
+    return (row['bars'], row['device'], row['ma'], row['stage'])
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--bars', default='1000,10000,100000')
+    parser.add_argument('--devices', default='desktop,mobile')
+    parser.add_argument('--ma', default='20,50,200')
+    parser.add_argument('--repeat', type=int, default=20)
+    parser.add_argument('--out', help='write results as JSON to this file')
+    parser.add_argument('--compare', help='JSON from an earlier run; adds p50 ratios (new / old)')
+    args = parser.parse_args()
+
+    bar_counts = [int(n) for n in args.bars.split(',')]
+    rows = []
+    try:
+        for bars in bar_counts:
+            set_provider(RandomWalkProvider(bars=bars))
+            bar_store.get_entry(f"SYN{bars}", '1d')
+        figure.warm()
+
+        for bars in bar_counts:
+            for device in args.devices.split(','):
+                for ma_period in (int(m) for m in args.ma.split(',')):
+                    rows.extend(run_case(bars, device == 'mobile', ma_period, args.repeat))
+    finally:
+        shutil.rmtree(bar_store.CACHE_DIR, ignore_errors=True)
+
+    baseline = {}
+    if args.compare:
+        with open(args.compare) as f:
+            baseline = {row_key(row): row for row in json.load(f)['results']}
+
+    print(f"{'bars':>7s} {'device':7s} {'ma':>4s} {'stage':10s} {'p50 ms':>9s} {'p95 ms':>9s} "
+          f"{'p99 ms':>9s} {'peak kB':>9s} {'size kB':>9s}" + ('   vs old' if baseline else ''))
+    for row in rows:
+        size = '' if row['size_bytes'] is None else f"{row['size_bytes'] / 1024:9.1f}"
+        line = (f"{row['bars']:7d} {row['device']:7s} {row['ma']:4d} {row['stage']:10s} "
+                f"{row['p50_ms']:9.2f} {row['p95_ms']:9.2f} {row['p99_ms']:9.2f} {row['peak_kb']:9.1f} {size:>9s}")
+        old = baseline.get(row_key(row))
+        if old is not None and old['p50_ms'] > 0:
+            line += f"   {row['p50_ms'] / old['p50_ms']:6.2f}x"
+        print(line)
+
+    if args.out:
+        result = {
+            'meta': {
+                'commit': git_commit(), 'time': time.strftime('%Y-%m-%dT%H:%M:%S%z'),
+                'python': platform.python_version(), 'numpy': np.__version__, 'pandas': pd.__version__,
+                'repeat': args.repeat,
+            },
+            'results': rows,
+        }
+        with open(args.out, 'w') as f:
+            json.dump(result, f, indent=1)
+
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -0,0 +1,109 @@
+'''
+Startup-time regression benchmark.
+
+    import    - `python -X importtime -c "import app"` with warm-up off: the
+                cumulative import time of app and the slowest modules under it
+    first /   - fresh process to the first home-page response
+    warm      - fresh process until app.warm() has finished (heavy imports,
+                chart layouts, plotly.js bundle)
+    first /chart - fresh process to the first chart on synthetic data
+
+Each figure is the median of --repeat fresh interpreters. With --check the
+medians are compared against bench/startup_budget.json and the exit status is
+1 when any is over budget.
+
+    python bench/startup.py [--repeat 5] [--top 15] [--check]
+'''
+
+import argparse
+import json
+import os
+import statistics
+import subprocess
+import sys
+import tempfile
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+BUDGET_PATH = os.path.join(ROOT, 'bench', 'startup_budget.json')
+
+# Runs in a fresh interpreter; prints one JSON line of millisecond timings
+PROBE = '''
+import json, time
+start = time.perf_counter()
+import app
+client = app.app.test_client()
+client.get("/")
+home = time.perf_counter()
+app.warm()
+warm = time.perf_counter()
+client.get("/chart?ticker=SPY&ma=50&interval=1d").get_data()
+chart = time.perf_counter()
+print(json.dumps({"first /": (home - start) * 1000, "warm": (warm - start) * 1000,
+                  "first /chart": (chart - start) * 1000}))
+'''
+
+
+def env(cache_dir):
+    result = dict(os.environ)
+    result.update({'WARM_ON_IMPORT': '0', 'DATA_PROVIDER': 'synthetic', 'CACHE_DIR': cache_dir})
+    return result
+
+
+def importtime(cache_dir):
+    '''Return (app cumulative ms, {module: cumulative ms}) from one -X importtime run.'''
+    proc = subprocess.run([sys.executable, '-X', 'importtime', '-c', 'import app'], cwd=ROOT,
+                          env=env(cache_dir), capture_output=True, text=True, check=True)
+    modules = {}
+    for line in proc.stderr.splitlines():
+        if not line.startswith('import time:') or 'cumulative' in line:
+            continue
+        _, cumulative, name = line.split('|')
+        modules[name.strip()] = int(cumulative) / 1000
+    return modules['app'], modules
+
+
+def probe(cache_dir):
+    proc = subprocess.run([sys.executable, '-c', PROBE], cwd=ROOT, env=env(cache_dir),
+                          capture_output=True, text=True, check=True)
+    return json.loads(proc.stdout.strip().splitlines()[-1])
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--repeat', type=int, default=5)
+    parser.add_argument('--top', type=int, default=15, help='slowest modules to list')
+    parser.add_argument('--check', action='store_true', help='fail if over bench/startup_budget.json')
+    args = parser.parse_args()
+
+    samples = {'import app': [], 'first /': [], 'warm': [], 'first /chart': []}
+    modules = {}
+    with tempfile.TemporaryDirectory() as cache_dir:
+        for _ in range(args.repeat):
+            total, modules = importtime(cache_dir)
+            samples['import app'].append(total)
+            for name, ms in probe(cache_dir).items():
+                samples[name].append(ms)
+
+    print("slowest imports (cumulative ms, last run):")
+    modules.pop('app', None)
+    for name, ms in sorted(modules.items(), key=lambda item: -item[1])[:args.top]:
+        print(f"  {ms:8.1f}  {name}")
+    print()
+
+    with open(BUDGET_PATH) as f:
+        budget = json.load(f)
+    over = []
+    for name, values in samples.items():
+        median = statistics.median(values)
+        limit = budget.get(name)
+        status = '' if limit is None else f"budget {limit:6.0f} ms" + ('  OVER' if median > limit else '')
+        print(f"{name:14s} {median:8.1f} ms  {status}")
+        if limit is not None and median > limit:
+            over.append(name)
+
+    if args.check and over:
+        return 1
+
+
+if __name__ == '__main__':
+    sys.exit(main())
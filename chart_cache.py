@@ -0,0 +1,67 @@
+'''
+Bounded in-memory LRU cache of rendered chart pages.
+
+Entries are keyed by the request shape (ticker, ma, interval, device) and carry
+the ETag of the bar data they were rendered from, so a page built from older
+bars is never served once the store has moved on. Each entry holds the page
+once per Content-Encoding it has been requested in, so compression runs once
+per page rather than once per response.
+'''
+
+import hashlib
+import os
+import threading
+from collections import OrderedDict
+
+CHART_CACHE_BYTES = int(os.environ.get('CHART_CACHE_BYTES', 64 * 1024 * 1024))
+
+# Bump when the page layout changes so clients drop their cached copies
+RENDER_VERSION = '7'
+
+
+def make_etag(key, data_version, title):
+    raw = f"{RENDER_VERSION}|{key!r}|{data_version}|{title}"
+    return hashlib.sha1(raw.encode()).hexdigest()[:20]
+
+
+class ChartCache:
+
+    def __init__(self, max_bytes):
+        self.max_bytes = max_bytes
+        self._entries = OrderedDict()  # key -> (etag, {encoding: body})
+        self._size = 0
+        self._lock = threading.Lock()
+
+    def get(self, key, etag):
+        '''Return the {encoding: body} variants cached for key, or None.'''
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is None or entry[0] != etag:
+                return None
+            self._entries.move_to_end(key)
+            return dict(entry[1])
+
+    def put(self, key, etag, variants):
+        '''Store variants for key, merged with any already held for the same etag.'''
+        with self._lock:
+            old = self._entries.pop(key, None)
+            if old is not None:
+                self._size -= sum(len(body) for body in old[1].values())
+                if old[0] == etag:
+                    variants = {**old[1], **variants}
+            size = sum(len(body) for body in variants.values())
+            if size > self.max_bytes:
+                return
+            self._entries[key] = (etag, variants)
+            self._size += size
+            while self._size > self.max_bytes:
+                _, (_, evicted) = self._entries.popitem(last=False)
+                self._size -= sum(len(body) for body in evicted.values())
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+            self._size = 0
+
+
+cache = ChartCache(CHART_CACHE_BYTES)
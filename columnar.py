@@ -0,0 +1,101 @@
+'''
+Columnar bar files that every worker process memory-maps read-only.
+
+Layout, all little-endian:
+
+    magic       8 bytes  b'BARCOL1\\n'
+    length      uint32   size of the JSON header
+    header      JSON     rows, columns and their dtypes, index unit/tz/name and
+                         caller metadata, space-padded so the arrays start
+                         8-byte aligned
+    timestamps  int64    rows values, the index in its own unit
+    values      one run of rows values per column, column after column, each
+                in its own dtype (float32 unless the writer asks otherwise)
+                and starting 8-byte aligned
+
+read() wraps each run in a column of a DataFrame without copying. Pages come
+from the OS page cache and are shared by every process that maps the file.
+Files written before the header listed dtypes hold unpadded float32 runs.
+'''
+
+import json
+import mmap
+import os
+import struct
+import threading
+
+import numpy as np
+import pandas as pd
+
+MAGIC = b'BARCOL1\n'
+_LENGTH = struct.Struct('<I')
+
+
+def write(path, bars, meta, dtypes=None):
+    '''Write bars (a frame of numeric columns on a DatetimeIndex) and meta to path.
+
+    dtypes maps columns to the dtype they are stored in, float32 otherwise.
+    The file is built under a temporary name and moved into place, so readers
+    map either the old file or the new one, never half of it.
+    '''
+    index = bars.index
+    header = {
+        'rows': len(bars),
+        'columns': list(bars.columns),
+        'dtypes': [np.dtype((dtypes or {}).get(c, '<f4')).newbyteorder('<').str for c in bars.columns],
+        'unit': index.unit,
+        'tz': str(index.tz) if index.tz is not None else None,
+        'name': index.name,
+        'meta': meta,
+    }
+    encoded = json.dumps(header).encode()
+    start = len(MAGIC) + _LENGTH.size + len(encoded)
+    encoded += b' ' * (-start % 8)
+
+    timestamps = index.tz_convert('UTC').tz_localize(None) if index.tz is not None else index
+
+    os.makedirs(os.path.dirname(path), exist_ok=True)
+    tmp = f"{path}.{os.getpid()}.{threading.get_ident()}.tmp"
+    with open(tmp, 'wb') as f:
+        f.write(MAGIC)
+        f.write(_LENGTH.pack(len(encoded)))
+        f.write(encoded)
+        f.write(timestamps.asi8.astype('<i8').tobytes())
+        for column, dtype in zip(bars.columns, header['dtypes']):
+            run = bars[column].to_numpy(dtype=dtype).tobytes()
+            f.write(run + b'\0' * (-len(run) % 8))
+    os.replace(tmp, path)
+
+
+def read(path):
+    '''Map path and return (bars, meta, mapping); bars' index and columns are views of the mapping.
+
+    The mapping holds a file descriptor until it is closed or garbage collected.
+    '''
+    with open(path, 'rb') as f:
+        mapped = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+    if mapped[:len(MAGIC)] != MAGIC:
+        raise ValueError(f"{path} is not a columnar bar file")
+    offset = len(MAGIC) + _LENGTH.size
+    length, = _LENGTH.unpack_from(mapped, len(MAGIC))
+    header = json.loads(mapped[offset:offset + length])
+    offset += length
+
+    rows, columns = header['rows'], header['columns']
+    dtypes = header.get('dtypes')
+    # Runs are padded to 8 bytes since the header lists dtypes
+    align = 8 if dtypes is not None else 1
+    # The arrays keep the mapping alive for as long as any view of them exists
+    timestamps = np.frombuffer(mapped, dtype='<i8', count=rows, offset=offset)
+    offset += 8 * rows
+    values = {}
+    for column, dtype in zip(columns, dtypes or ['<f4'] * len(columns)):
+        values[column] = np.frombuffer(mapped, dtype=dtype, count=rows, offset=offset)
+        offset += values[column].nbytes
+        offset += -offset % align
+
+    index = pd.DatetimeIndex(timestamps.view(f"M8[{header['unit']}]"), name=header['name'], copy=False)
+    if header['tz'] is not None:
+        index = index.tz_localize('UTC').tz_convert(header['tz'])
+    bars = pd.DataFrame(values, index=index, columns=columns, copy=False)
+    return bars, header['meta'], mapped
@@ -0,0 +1,74 @@
+'''
+Content-Encoding negotiation and streaming compressors for HTML and assets.
+
+gzip is always available; brotli is preferred when the brotli package is
+installed and the client accepts it.
+'''
+
+import os
+import zlib
+
+try:
+    import brotli
+except ImportError:
+    brotli = None
+
+GZIP_LEVEL = int(os.environ.get('GZIP_LEVEL', 6))
+BROTLI_QUALITY = int(os.environ.get('BROTLI_QUALITY', 5))
+
+IDENTITY = 'identity'
+
+
+def available():
+    '''Encodings this server can produce, best first.'''
+    return ['br', 'gzip'] if brotli is not None else ['gzip']
+
+
+def choose(accept_encodings):
+    '''Best encoding for a request's Accept-Encoding (werkzeug Accept object).'''
+    if brotli is not None and accept_encodings['br']:
+        return 'br'
+    if accept_encodings['gzip']:
+        return 'gzip'
+    return IDENTITY
+
+
+def variant_etag(etag, encoding):
+    # Each encoding is a different byte sequence, so it needs its own strong ETag
+    return etag if encoding == IDENTITY else f"{etag}-{encoding}"
+
+
+class Compressor:
+    '''Incremental encoder; flush() pushes everything so far out to the client.'''
+
+    def __init__(self, encoding):
+        self.encoding = encoding
+        if encoding == 'br':
+            self._c = brotli.Compressor(quality=BROTLI_QUALITY)
+        elif encoding == 'gzip':
+            # wbits 16+ writes a gzip header and trailer instead of raw zlib
+            self._c = zlib.compressobj(GZIP_LEVEL, zlib.DEFLATED, 16 + zlib.MAX_WBITS)
+        else:
+            self._c = None
+
+    def compress(self, chunk, flush=False):
+        if self._c is None:
+            return chunk
+        if self.encoding == 'br':
+            out = self._c.process(chunk)
+            return out + self._c.flush() if flush else out
+        out = self._c.compress(chunk)
+        return out + self._c.flush(zlib.Z_SYNC_FLUSH) if flush else out
+
+    def finish(self):
+        if self._c is None:
+            return b''
+        if self.encoding == 'br':
+            return self._c.finish()
+        return self._c.flush()
+
+
+def compress(body, encoding):
+    '''One-shot encode of a complete body.'''
+    compressor = Compressor(encoding)
+    return compressor.compress(body) + compressor.finish()
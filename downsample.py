@@ -0,0 +1,98 @@
+'''
+Largest-Triangle-Three-Buckets (LTTB) decimation for chart traces.
+
+LTTB keeps the first and last points and, from each of n_out - 2 equal buckets
+in between, the point forming the largest triangle with the point kept from
+the previous bucket and the average of the next bucket. Peaks and troughs
+survive, so a 10k-bar history drawn with ~1k points looks the same on screen.
+'''
+
+import numpy as np
+
+# Widest bucket scored as a (buckets, width, width) table of pairs; above it,
+# bucket by bucket
+TABLE_WIDTH = 16
+# Pair scores computed per NumPy call, bounding the table's memory
+TABLE_CHUNK = 1 << 20
+
+
+def lttb_indices(x, y, n_out):
+    '''Return the sorted positions of the points LTTB keeps out of (x, y).'''
+    n = len(y)
+    if n_out >= n or n_out < 3:
+        return np.arange(n)
+
+    x = np.asarray(x, dtype=np.float64)
+    y = np.asarray(y, dtype=np.float64)
+
+    # Bucket i covers [edges[i], edges[i + 1]); the first and last points are
+    # kept as-is, so buckets only span the interior points
+    edges = np.linspace(1, n - 1, n_out - 1).astype(np.int64)
+    counts = np.diff(edges)
+
+    # All bucket averages in one pass; the last "next bucket" is the final point
+    avg_x = np.append(np.add.reduceat(x[1:n - 1], edges[:-1] - 1) / counts, x[-1])
+    avg_y = np.append(np.add.reduceat(y[1:n - 1], edges[:-1] - 1) / counts, y[-1])
+
+    if counts.max() <= TABLE_WIDTH:
+        return _narrow(x, y, edges, counts, avg_x, avg_y)
+    return _wide(x, y, edges, avg_x, avg_y)
+
+
+def _area(xa, ya, bx, by, ax, ay):
+    # Twice the triangle area; the constant factor doesn't change argmax
+    return np.abs((xa - ax) * (by - ya) - (xa - bx) * (ay - ya))
+
+
+def _narrow(x, y, edges, counts, avg_x, avg_y):
+    # Which point a bucket keeps depends only on the point kept from the one
+    # before, so score every pair of (previous bucket point, bucket point) in
+    # bulk and then just follow the picks from the first point on
+    n, buckets, width = len(y), len(counts), int(counts.max())
+    # (buckets, width) positions, short buckets padded with their first point,
+    # which argmax prefers over its copies
+    pos = edges[:-1, None] + np.arange(width)
+    pos = np.where(pos < edges[1:, None], pos, edges[:-1, None])
+    anchors = np.vstack((np.zeros((1, width), dtype=np.int64), pos[:-1]))
+
+    best = np.empty((buckets, width), dtype=np.int64)
+    step = max(1, TABLE_CHUNK // (width * width))
+    for lo in range(0, buckets, step):
+        hi = min(lo + step, buckets)
+        area = _area(x[anchors[lo:hi], None], y[anchors[lo:hi], None],
+                     x[pos[lo:hi, None, :]], y[pos[lo:hi, None, :]],
+                     avg_x[lo + 1:hi + 1, None, None], avg_y[lo + 1:hi + 1, None, None])
+        best[lo:hi] = area.argmax(axis=2)
+
+    picks = np.empty(buckets, dtype=np.int64)
+    column = 0
+    for i, row in enumerate(best.tolist()):
+        column = row[column]
+        picks[i] = column
+    return np.concatenate(([0], edges[:-1] + picks, [n - 1]))
+
+
+def _wide(x, y, edges, avg_x, avg_y):
+    # Few buckets of many points each: one vector per bucket, with the
+    # bookkeeping in Python scalars rather than NumPy ones
+    n, buckets = len(y), len(edges) - 1
+    bounds, ax, ay = edges.tolist(), avg_x.tolist(), avg_y.tolist()
+    keep = np.empty(buckets + 2, dtype=np.int64)
+    keep[0] = 0
+    keep[-1] = n - 1
+    a = 0
+    for i in range(buckets):
+        lo, hi = bounds[i], bounds[i + 1]
+        area = _area(x.item(a), y.item(a), x[lo:hi], y[lo:hi], ax[i + 1], ay[i + 1])
+        a = lo + int(area.argmax())
+        keep[i + 1] = a
+    return keep
+
+
+def lttb_series(series, n_out):
+    '''Downsample a pandas Series with a DatetimeIndex, dropping NaNs first.'''
+    series = series.dropna()
+    if n_out is None or len(series) <= n_out:
+        return series
+    x = series.index.values.astype('datetime64[ns]').astype(np.int64)
+    return series.iloc[lttb_indices(x, series.to_numpy(dtype=np.float64), n_out)]
@@ -0,0 +1,365 @@
+'''
+Chart figure construction and page rendering.
+
+build_figure() is the plain Plotly object path. Everything in its layout
+depends only on the device, so chart_figure() builds it once per device as a
+dict skeleton and per request only swaps in the trace arrays, trace names and
+title, skipping Plotly's property validation. Trace arrays are encoded
+straight from the NumPy buffers as typed arrays, with the x axis in epoch
+milliseconds on date-typed axes, and render_page() writes the HTML without
+going through pio.to_html. Plotly itself is only imported to build the
+skeletons, which warm() does off the request path.
+'''
+
+import threading
+import uuid
+
+from serialize import dumps, epoch_millis, typed_array
+
+# --- Inject custom CSS to enlarge modebar buttons and optimize for mobile ---
+MOBILE_CSS = """
+<style>
+    html, body {
+        margin: 0;
+        padding: 0;
+        height: 100%;
+        overflow-x: hidden;
+    }
+    .modebar {
+        transform: scale(1.4);
+        transform-origin: top right;
+    }
+    .modebar-btn {
+        padding: 8px !important;
+        margin: 2px !important;
+    }
+    .plot-container {
+        height: 130vh !important;  /* Even taller for more bottom space */
+        min-height: 130vh !important;
+    }
+    .js-plotly-plot {
+        height: 130vh !important;
+    }
+    @media (max-width: 768px) {
+        .modebar {
+            transform: scale(1.2);
+        }
+        .js-plotly-plot .plotly .modebar {
+            left: 10px !important;
+            right: auto !important;
+        }
+        .main-svg {
+            overflow: visible !important;
+        }
+        body {
+            overflow-y: auto !important;  /* Enable vertical scrolling */
+        }
+    }
+</style>
+"""
+
+DESKTOP_CSS = """
+<style>
+    html, body {
+        margin: 0;
+        padding: 0;
+        height: 100%;
+    }
+    .modebar {
+        transform: scale(1.8);
+        transform-origin: top right;
+    }
+    .modebar-btn {
+        padding: 12px !important;
+        margin: 4px !important;
+    }
+    .plot-container {
+        height: 100vh !important;
+    }
+</style>
+"""
+
+
+# Helper function to wrap long text for mobile
+def wrap_text_for_mobile(text, max_length=25):
+    if len(text) <= max_length:
+        return text
+    # Find a good place to break (prefer spaces)
+    words = text.split()
+    lines = []
+    current_line = ""
+    
+    for word in words:
+        if len(current_line + " " + word) <= max_length:
+            current_line += (" " + word) if current_line else word
+        else:
+            if current_line:
+                lines.append(current_line)
+            current_line = word
+    
+    if current_line:
+        lines.append(current_line)
+    
+    return "<br>".join(lines)
+
+
+def chart_title(ticker, tickername, is_mobile):
+    # Format title for mobile vs desktop
+    return f"<b>{wrap_text_for_mobile(tickername)}</b>" if is_mobile else f"<b>{ticker} ({tickername})</b>"
+
+
+def build_figure(traces, title, is_mobile):
+    '''Build the 3-row chart; traces are (x, y, name) for Close, MA, Momentum and RSI.'''
+    import plotly.graph_objects as go
+    from plotly.subplots import make_subplots
+
+    # Adjust font sizes for mobile
+    title_size = 24 if is_mobile else 36
+    subtitle_size = 16 if is_mobile else 24
+    legend_size = 12 if is_mobile else 16
+
+    # --- Create Plotly chart with 3 rows ---
+    fig = make_subplots(
+        rows=3, cols=1,
+        shared_xaxes=True,
+        row_heights=[0.55, 0.225, 0.225] if is_mobile else [0.6, 0.2, 0.2],
+        vertical_spacing=0.08 if is_mobile else 0.05,
+        subplot_titles=("", "Normalized Momentum", "RSI (14-period)")
+    )
+    
+    # Update subplot title formatting
+    fig.update_annotations(
+        font=dict(
+            size=subtitle_size,
+            color='black',
+            weight='bold'
+        )
+    )
+    
+    # --- Row 1: Price & MA ---
+    fig.add_trace(
+        go.Scatter(x=traces[0][0], y=traces[0][1], name=traces[0][2], line=dict(color='black', width=2)),
+        row=1, col=1
+    )
+    fig.add_trace(
+        go.Scatter(x=traces[1][0], y=traces[1][1], name=traces[1][2], line=dict(color='blue', width=2, dash='dash')),
+        row=1, col=1
+    )
+
+    # --- Row 2: Momentum ---
+    fig.add_trace(
+        go.Scatter(x=traces[2][0], y=traces[2][1], name=traces[2][2], line=dict(color='darkred', width=2)),
+        row=2, col=1
+    )
+
+    # --- Row 3: RSI ---
+    fig.add_trace(
+        go.Scatter(x=traces[3][0], y=traces[3][1], name=traces[3][2], line=dict(color='green', width=2)),
+        row=3, col=1
+    )
+
+    # --- Layout settings ---        
+    fig.update_layout(
+        title={
+            'text': title,
+            'font': {
+                'size': title_size,
+                'color': 'black'
+            },
+            'x': 0.5,
+            'xanchor': 'center',
+            'y': 0.92 if is_mobile else 0.95,  # Moved down on mobile to avoid toolbar
+            'yanchor': 'top'
+        },
+        autosize=True,
+        height=None,
+        showlegend=True,
+        template="plotly_white",
+        hovermode='x unified',
+        legend=dict(
+            x=1.02 if not is_mobile else 0.5,
+            y=0.75 if not is_mobile else -0.15,  # Moved legend up from -0.25 to -0.15
+            xanchor='left' if not is_mobile else 'center',
+            yanchor='middle' if not is_mobile else 'top',
+            font=dict(size=legend_size),
+            bgcolor='rgba(255,255,255,0.95)' if is_mobile else 'rgba(255,255,255,0)',
+            bordercolor='gray' if is_mobile else 'black',
+            borderwidth=1 if is_mobile else 0,
+            orientation='h' if is_mobile else 'v'
+        ),
+        margin=dict(
+            t=120 if is_mobile else 100,
+            l=40,
+            r=40,
+            b=200 if is_mobile else 60  # Increased bottom margin even more
+        )
+    )
+
+    fig.update_xaxes(title_text="Date", row=3, col=1, title_font_size=12 if is_mobile else 14)
+    fig.update_yaxes(title_text="Price", row=1, col=1, title_font_size=12 if is_mobile else 14)
+    fig.update_yaxes(title_text="Momentum", row=2, col=1, title_font_size=12 if is_mobile else 14)
+    fig.update_yaxes(title_text="RSI", row=3, col=1, range=[0, 100], title_font_size=12 if is_mobile else 14)
+
+    return fig
+
+
+_skeletons = {}
+_lock = threading.Lock()
+
+
+def skeleton(is_mobile):
+    '''Return the figure dict for is_mobile with empty traces, building it on first use.'''
+    with _lock:
+        if is_mobile not in _skeletons:
+            empty = [([], [], '')] * 4
+            fig = build_figure(empty, '', is_mobile).to_dict()
+            # x values are sent as epoch milliseconds, so the axes must be told they're dates
+            for name, axis in fig['layout'].items():
+                if name.startswith('xaxis'):
+                    axis['type'] = 'date'
+            _skeletons[is_mobile] = fig
+        return _skeletons[is_mobile]
+
+
+def warm():
+    for is_mobile in (False, True):
+        skeleton(is_mobile)
+
+
+def chart_figure(traces, title, is_mobile):
+    '''Figure dict for traces of (DatetimeIndex, values, name), filled into the cached skeleton.'''
+    base = skeleton(is_mobile)
+    data = [
+        dict(template, x=typed_array(epoch_millis(x)), y=typed_array(y), name=name)
+        for template, (x, y, name) in zip(base['data'], traces)
+    ]
+    layout = dict(base['layout'], title=dict(base['layout']['title'], text=title))
+    return {'data': data, 'layout': layout}
+
+
+def sweep_colors(count):
+    # Blue for the shortest period through to red for the longest
+    return [f"hsl({240 - 240 * i // max(1, count - 1)}, 70%, 45%)" for i in range(count)]
+
+
+def sweep_figure(close, rsi, mas, momenta, periods, title, is_mobile, heatmap=None):
+    '''Figure dict for an MA sweep in the same three-row layout as chart_figure().
+
+    close is (DatetimeIndex, values, name) and rsi (DatetimeIndex, values); mas and momenta hold one
+    (DatetimeIndex, values) per period. The middle row shows one momentum line
+    per period, or with heatmap=(DatetimeIndex, z) a period x time heatmap of
+    momentum where z has one row per period.
+    '''
+    base = skeleton(is_mobile)
+    close_t, ma_t, momentum_t, rsi_t = base['data']
+
+    def trace(template, x, y, **extra):
+        return dict(template, x=typed_array(epoch_millis(x)), y=typed_array(y), **extra)
+
+    colors = sweep_colors(len(periods))
+    data = [trace(close_t, close[0], close[1], name=close[2])]
+    for (x, y), period, color in zip(mas, periods, colors):
+        data.append(trace(ma_t, x, y, name=f"{period}-Period MA", legendgroup=str(period),
+                          line=dict(ma_t['line'], color=color, width=1)))
+    if heatmap is None:
+        for (x, y), period, color in zip(momenta, periods, colors):
+            data.append(trace(momentum_t, x, y, name=f"{period}-Period Momentum", legendgroup=str(period),
+                              showlegend=False, line=dict(momentum_t['line'], color=color, width=1)))
+    else:
+        x, z = heatmap
+        data.append({
+            'type': 'heatmap', 'name': 'Normalized Momentum',
+            'x': typed_array(epoch_millis(x)), 'y': list(periods), 'z': typed_array(z),
+            'colorscale': 'RdBu', 'zmid': 0, 'showscale': False,
+            'xaxis': momentum_t['xaxis'], 'yaxis': momentum_t['yaxis'],
+        })
+    data.append(trace(rsi_t, *rsi, name="14-period RSI"))
+
+    layout = dict(base['layout'], title=dict(base['layout']['title'], text=title))
+    if heatmap is not None:
+        layout['yaxis2'] = dict(layout['yaxis2'], title=dict(layout['yaxis2']['title'], text='MA period'))
+    return {'data': data, 'layout': layout}
+
+
+def page_head(css, plotlyjs_url, div_id):
+    '''Everything up to the figure data: CSS, plotly.js bootstrap and the plot div.
+
+    Sent before the figure is computed so the browser can start fetching
+    plotly.js while the server is still working.
+    '''
+    div_id = div_id.encode()
+    return b''.join([
+        b'<html>\n<head><meta charset="utf-8" />', css.encode(), b'</head>\n<body>\n    <div>',
+        b'<script type="text/javascript">window.PlotlyConfig = {MathJaxConfig: \'local\'};</script>\n',
+        b'        <script charset="utf-8" src="', plotlyjs_url.encode(), b'"></script>\n',
+        b'        <div id="', div_id, b'" class="plotly-graph-div" style="height:100%; width:100%;"></div>\n',
+        b'        <script type="text/javascript">\n',
+        b'            window.PLOTLYENV=window.PLOTLYENV || {};\n',
+        b'            if (document.getElementById("', div_id, b'")) {\n',
+        b'                Plotly.newPlot("', div_id, b'", ',
+    ])
+
+
+# Applies /chart/stream updates to the four chart_figure() traces: the points
+# from the update's "from" on are dropped (the page's last bar may have been
+# forming when it was drawn, and a forming weekly or monthly bar's date moves)
+# and the update's bars are appended
+STREAM_SCRIPT = """
+        <script type="text/javascript">
+            (function () {
+                var gd = document.getElementById("__DIV__");
+                if (!gd || !window.EventSource) { return; }
+                var keys = ["close", "ma", "momentum", "rsi"], traces = [0, 1, 2, 3];
+                function values(a) {
+                    // Arrays from the page are base64 float64 typed-array specs
+                    if (!a.bdata) { return a; }
+                    var bytes = Uint8Array.from(atob(a.bdata), function (c) { return c.charCodeAt(0); });
+                    return new Float64Array(bytes.buffer);
+                }
+                new EventSource("__URL__").addEventListener("bars", function (e) {
+                    var bars = JSON.parse(e.data), cut = bars.from * 1000;
+                    var x = bars.t.map(function (t) { return t * 1000; });
+                    var kept = {x: [], y: []}, added = {x: [], y: []};
+                    traces.forEach(function (i) {
+                        var tx = values(gd.data[i].x), ty = values(gd.data[i].y), n = tx.length;
+                        while (n > 0 && tx[n - 1] >= cut) { n--; }
+                        kept.x.push(tx.slice(0, n));
+                        kept.y.push(ty.slice(0, n));
+                        added.x.push(x);
+                        added.y.push(bars[keys[i]]);
+                    });
+                    Plotly.restyle(gd, kept, traces);
+                    Plotly.extendTraces(gd, added, traces);
+                });
+            })();
+        </script>"""
+
+
+def stream_script(div_id, url):
+    '''Script that keeps the chart in div_id current from the SSE stream at url.'''
+    return STREAM_SCRIPT.replace('__DIV__', div_id).replace('__URL__', url).encode()
+
+
+def page_body(fig, div_id, stream_url=None):
+    '''Yield the rest of the page after page_head(): trace data, layout and closing tags.
+
+    With stream_url the page also subscribes to live updates; see stream_script().
+    '''
+    # "</" inside JSON would end the script element early
+    yield dumps(fig['data']).replace(b'</', b'<\\/')
+    yield b', '
+    yield dumps(fig['layout']).replace(b'</', b'<\\/')
+    yield b', {"responsive": true})\n            };\n        </script>'
+    if stream_url is not None:
+        yield stream_script(div_id, stream_url)
+    yield b'\n    </div>\n</body>\n</html>'
+
+
+def new_div_id():
+    return str(uuid.uuid4())
+
+
+def render_page(fig, css, plotlyjs_url):
+    '''Full HTML document for fig, laid out like pio.to_html(full_html=True) output.'''
+    div_id = new_div_id()
+    return page_head(css, plotlyjs_url, div_id) + b''.join(page_body(fig, div_id))
@@ -0,0 +1,75 @@
+'''
+Production gunicorn settings: gunicorn -c gunicorn.conf.py app:app
+
+Threaded workers (gthread) so a request waiting on a slow upstream download
+only ties up one thread, not a whole process. The app is loaded once in the
+master before forking and, unless WARM_IN_MASTER=0, so are pandas, plotly and
+yfinance, whose pages are then shared copy-on-write between workers.
+
+Every value can be overridden from the environment:
+
+    WEB_CONCURRENCY     worker processes (default 2 per CPU, at most 4)
+    GUNICORN_THREADS    threads per worker (default 8)
+    GUNICORN_TIMEOUT    seconds before a silent worker is killed
+    MAX_REQUESTS        recycle a worker after this many requests (0 = never)
+    WARM_IN_MASTER      import pandas/plotly/yfinance in the master before
+                        forking (default 1); 0 starts workers at once and
+                        lets each warm up in the background
+'''
+
+import multiprocessing
+import os
+
+# Must match upstream.UPSTREAM_TIMEOUT; read here so the config doesn't import the app
+UPSTREAM_TIMEOUT = float(os.environ.get('UPSTREAM_TIMEOUT', 20))
+
+bind = f"0.0.0.0:{os.environ.get('PORT', '8000')}"
+
+# --- Workers ---
+# Requests are mostly waiting on upstream I/O or holding the GIL for pandas
+# work, so a few processes with several threads each beats many sync workers.
+# Capped because each process keeps its own bar, chart and indicator caches.
+worker_class = 'gthread'
+workers = int(os.environ.get('WEB_CONCURRENCY', min(2 * multiprocessing.cpu_count(), 4)))
+threads = int(os.environ.get('GUNICORN_THREADS', 8))
+preload_app = True
+
+# --- Timeouts ---
+# A request waits at most UPSTREAM_TIMEOUT for a download and then renders from
+# cached bars; leave room for that plus the render before declaring a worker hung.
+timeout = int(os.environ.get('GUNICORN_TIMEOUT', UPSTREAM_TIMEOUT + 30))
+graceful_timeout = int(UPSTREAM_TIMEOUT + 10)
+# Longer than the load balancer's idle timeout so it closes connections first
+keepalive = 75
+
+# --- Recycling ---
+# Restart workers now and then to cap slow memory growth from pandas/plotly;
+# the jitter keeps them from all restarting at once.
+max_requests = int(os.environ.get('MAX_REQUESTS', 2000))
+max_requests_jitter = max_requests // 10
+
+# Heartbeat files on tmpfs: a slow disk can otherwise look like a hung worker
+if os.path.isdir('/dev/shm'):
+    worker_tmp_dir = '/dev/shm'
+
+accesslog = '-'
+
+# --- Warm-up ---
+# Importing app is cheap; the heavy modules load in app.warm(). In the master
+# they are shared copy-on-write by every worker, but workers only start once it
+# finishes. Without it each worker answers "/" and /healthz straight away and
+# warms on a background thread.
+WARM_IN_MASTER = os.environ.get('WARM_IN_MASTER', '1') != '0'
+os.environ.setdefault('WARM_ON_IMPORT', '0')
+
+
+def when_ready(server):
+    if WARM_IN_MASTER:
+        import app
+        # Names, scheduler and other threads start in the workers: threads don't survive fork
+        app.warm(background=False)
+
+
+def post_worker_init(worker):
+    import app
+    app.warm_in_background()
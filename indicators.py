@@ -0,0 +1,277 @@
+'''
+Structural momentum and RSI indicators shared by the chart page and the data API.
+'''
+
+import math
+import os
+import threading
+from collections import OrderedDict, deque
+
+import numpy as np
+import pandas as pd
+
+RSI_PERIOD = 14
+
+
+def rsi(close):
+    '''RSI_PERIOD-bar RSI of a close Series, or column-wise for a DataFrame.'''
+    delta = close.diff()
+    gain = delta.where(delta > 0, 0).rolling(window=RSI_PERIOD).mean()
+    loss = -delta.where(delta < 0, 0).rolling(window=RSI_PERIOD).mean()
+    rs = gain / loss
+    return 100 - (100 / (1 + rs))
+
+
+def momentum_rsi(close, ma_period):
+    '''Return (MA, Momentum, RSI) for a close Series, or column-wise for a DataFrame.'''
+    # --- Calculate Momentum ---
+    ma = close.rolling(window=ma_period).mean()
+    momentum = (close - ma) / ma
+
+    # --- Calculate RSI (14-period) ---
+    return ma, momentum, rsi(close)
+
+
+def ma_sweep(close, periods):
+    '''Return (MA, Momentum) arrays of shape (len(periods), len(close)) for many MA periods.
+
+    Every window sum is a difference of one cumulative sum of the closes, so
+    all periods come out of a single pass over the history. Closes are taken
+    relative to the first one to keep the cumulative sum, and its rounding
+    error, small. close must not contain NaNs.
+    '''
+    values = np.asarray(close, dtype=np.float64)
+    periods = np.asarray(periods, dtype=np.int64)
+    n = len(values)
+    base = values[0] if n else 0.0
+    cumsum = np.concatenate(([0.0], np.cumsum(values - base)))
+    # Row i, column t is the window of periods[i] bars ending at bar t
+    ends = np.arange(1, n + 1)
+    starts = ends[None, :] - periods[:, None]
+    defined = starts >= 0
+    ma = (cumsum[ends][None, :] - cumsum[np.maximum(starts, 0)]) / periods[:, None] + base
+    ma[~defined] = np.nan
+    momentum = (values[None, :] - ma) / ma
+    return ma, momentum
+
+
+def warmup_bars(ma_period):
+    '''Bars needed before the first bar with a defined MA, Momentum and RSI.
+
+    The MA window reaches back ma_period - 1 bars, RSI needs RSI_PERIOD price
+    changes; both windows cover the same earlier bars, so the larger wins.
+    '''
+    return max(ma_period - 1, RSI_PERIOD)
+
+
+def add_indicators(data, ma_period, series_key=None, revision=None):
+    '''Add MA, Momentum and RSI columns to an OHLCV frame and return it.
+
+    With a series_key, e.g. (ticker, interval), the incremental engine is used
+    so repeat calls on a growing series only process the new bars; revision
+    is passed on to it (see IndicatorEngine.momentum_rsi).
+    '''
+    if series_key is None:
+        data['MA'], data['Momentum'], data['RSI'] = momentum_rsi(data['Close'], ma_period)
+    else:
+        data['MA'], data['Momentum'], data['RSI'] = engine.momentum_rsi(series_key, data['Close'], ma_period,
+                                                                        revision)
+    return data
+
+
+def add_sweep(data, periods):
+    '''Add MA_<n> and Momentum_<n> for every period n, and RSI, to an OHLCV frame.
+
+    Returns (frame, indicator column names in order).
+    '''
+    ma, momentum = ma_sweep(data['Close'], periods)
+    columns = {}
+    for period, ma_row, momentum_row in zip(periods, ma, momentum):
+        columns[f"MA_{period}"] = ma_row
+        columns[f"Momentum_{period}"] = momentum_row
+    columns['RSI'] = rsi(data['Close'])
+    return data.assign(**columns), list(columns)
+
+
+def align_right(closes):
+    '''Stack {ticker: close Series} into one frame aligned on each ticker's last bar.
+
+    Row -1 is every ticker's latest bar, row -2 the one before, and so on;
+    shorter histories are NaN-padded at the top. Rolling windows over the rows
+    then cover the same bars they would per ticker, even when exchanges trade
+    on different calendars, so momentum_rsi() runs once for the whole list.
+    '''
+    length = max((len(close) for close in closes.values()), default=0)
+    panel = np.full((length, len(closes)), np.nan)
+    for i, close in enumerate(closes.values()):
+        if len(close):
+            panel[length - len(close):, i] = close.to_numpy(dtype=np.float64)
+    return pd.DataFrame(panel, columns=list(closes))
+
+
+# --- Incremental engine ---
+#
+# momentum_rsi() above is the reference implementation. The engine below keeps
+# running sums per (series, ma_period) so that when a request brings one new
+# bar it costs O(new bars) instead of re-rolling the whole history.
+
+INDICATOR_CACHE_SIZE = int(os.environ.get('INDICATOR_CACHE_SIZE', 256))
+
+
+def _rsi(gain_sum, loss_sum):
+    # Same edge cases as the pandas formula: no losses -> 100, flat window -> NaN
+    if loss_sum == 0:
+        return 100.0 if gain_sum > 0 else math.nan
+    return 100 - (100 / (1 + gain_sum / loss_sum))
+
+
+class IndicatorState:
+    '''Running MA and RSI sums for one close series, advanced bar by bar.'''
+
+    def __init__(self, ma_period):
+        self.ma_period = ma_period
+        self.closes = deque(maxlen=ma_period)
+        self.gains = deque(maxlen=RSI_PERIOD)
+        self.losses = deque(maxlen=RSI_PERIOD)
+        self.close_sum = 0.0
+        self.gain_sum = 0.0
+        self.loss_sum = 0.0
+        self.last_close = None
+        self.count = 0
+
+    @classmethod
+    def from_history(cls, ma_period, closes):
+        '''Seed the state as if every value in closes had been pushed.'''
+        state = cls(ma_period)
+        closes = np.asarray(closes, dtype=np.float64)
+        if len(closes) == 0:
+            return state
+        # The first bar has no previous close; the reference counts it as a zero move
+        deltas = np.diff(closes[-(RSI_PERIOD + 1):])
+        if len(closes) <= RSI_PERIOD:
+            deltas = np.concatenate(([0.0], deltas))
+        state.closes.extend(closes[-ma_period:].tolist())
+        state.gains.extend(np.maximum(deltas, 0).tolist())
+        state.losses.extend(np.maximum(-deltas, 0).tolist())
+        state._resync()
+        state.last_close = float(closes[-1])
+        state.count = len(closes)
+        return state
+
+    def _resync(self):
+        # Re-sum exactly from the windows so add/subtract drift never accumulates
+        self.close_sum = math.fsum(self.closes)
+        self.gain_sum = math.fsum(self.gains)
+        self.loss_sum = math.fsum(self.losses)
+
+    def _advance(self, close):
+        delta = 0.0 if self.last_close is None else close - self.last_close
+        gain = max(delta, 0.0)
+        loss = max(-delta, 0.0)
+        close_sum = self.close_sum + close
+        if len(self.closes) == self.ma_period:
+            close_sum -= self.closes[0]
+        gain_sum = self.gain_sum + gain
+        loss_sum = self.loss_sum + loss
+        if len(self.gains) == RSI_PERIOD:
+            gain_sum -= self.gains[0]
+            loss_sum -= self.losses[0]
+        return gain, loss, close_sum, gain_sum, loss_sum
+
+    def _values(self, close, count, close_sum, gain_sum, loss_sum):
+        if count >= self.ma_period:
+            ma = close_sum / self.ma_period
+            momentum = (close - ma) / ma
+        else:
+            ma = momentum = math.nan
+        rsi = _rsi(gain_sum, loss_sum) if count >= RSI_PERIOD else math.nan
+        return ma, momentum, rsi
+
+    def peek(self, close):
+        '''Return (ma, momentum, rsi) with close as the next bar, without consuming it.'''
+        _, _, close_sum, gain_sum, loss_sum = self._advance(close)
+        return self._values(close, self.count + 1, close_sum, gain_sum, loss_sum)
+
+    def push(self, close):
+        '''Consume close as the next bar and return its (ma, momentum, rsi).'''
+        gain, loss, self.close_sum, self.gain_sum, self.loss_sum = self._advance(close)
+        self.closes.append(close)
+        self.gains.append(gain)
+        self.losses.append(loss)
+        self.last_close = close
+        self.count += 1
+        if self.count % self.ma_period == 0 or self.count % RSI_PERIOD == 0:
+            self._resync()
+        return self._values(close, self.count, self.close_sum, self.gain_sum, self.loss_sum)
+
+
+class _CachedSeries:
+
+    def __init__(self, ma_period, index, closes, revision):
+        # Everything but the last bar is committed: the last one may still be
+        # forming and get revised by the next refresh
+        committed = len(closes) - 1
+        ma, momentum, rsi = momentum_rsi(pd.Series(closes[:committed]), ma_period)
+        self.ma = ma.to_numpy()
+        self.momentum = momentum.to_numpy()
+        self.rsi = rsi.to_numpy()
+        self.state = IndicatorState.from_history(ma_period, closes[:committed])
+        self.revision = revision
+        self.first = index[0]
+        self.last = index[committed - 1] if committed else None
+
+    def extends(self, index, closes, revision):
+        '''True if (index, closes) is the committed history plus zero or more bars.'''
+        k = self.state.count
+        if k == 0 or len(closes) <= k or revision != self.revision:
+            return False
+        return index[0] == self.first and index[k - 1] == self.last
+
+    def advance(self, index, closes):
+        k = self.state.count
+        new = [self.state.push(float(c)) for c in closes[k:len(closes) - 1]]
+        if new:
+            ma, momentum, rsi = zip(*new)
+            self.ma = np.concatenate((self.ma, ma))
+            self.momentum = np.concatenate((self.momentum, momentum))
+            self.rsi = np.concatenate((self.rsi, rsi))
+            self.last = index[len(closes) - 2]
+
+
+class IndicatorEngine:
+    '''LRU of incremental indicator state keyed by (series key, ma_period).'''
+
+    def __init__(self, max_series=INDICATOR_CACHE_SIZE):
+        self.max_series = max_series
+        self._series = OrderedDict()
+        self._lock = threading.Lock()
+
+    def momentum_rsi(self, key, close, ma_period, revision=None):
+        '''Same result as momentum_rsi(close, ma_period), updated in O(new bars).
+
+        Bars before the last one are taken as final while revision stays the
+        same; pass a new one (a bar store entry's revised_at) when any of them
+        may have changed and the state is rebuilt.
+        '''
+        if close.empty:
+            return momentum_rsi(close, ma_period)
+        index = close.index
+        closes = close.to_numpy(dtype=np.float64)
+        with self._lock:
+            cached = self._series.get((key, ma_period))
+            if cached is not None and cached.extends(index, closes, revision):
+                cached.advance(index, closes)
+                self._series.move_to_end((key, ma_period))
+            else:
+                cached = _CachedSeries(ma_period, index, closes, revision)
+                self._series[(key, ma_period)] = cached
+                while len(self._series) > self.max_series:
+                    self._series.popitem(last=False)
+            last = cached.state.peek(float(closes[-1]))
+            ma = np.append(cached.ma, last[0])
+            momentum = np.append(cached.momentum, last[1])
+            rsi = np.append(cached.rsi, last[2])
+        return pd.Series(ma, index=index), pd.Series(momentum, index=index), pd.Series(rsi, index=index)
+
+
+engine = IndicatorEngine()
@@ -0,0 +1,159 @@
+'''
+Live chart updates for /chart/stream (Server-Sent Events).
+
+One Poller thread per (ticker, interval) watches the bar store and fans
+updates out to every subscribed page, whatever its MA period. An update is
+sent when bars close that a page doesn't have yet: it carries the bars from
+the page's last one on, that is the closed bars with the indicator values the
+incremental engine computes, plus the still-forming last bar so the page
+stays complete. The update's "from" is the page's last bar as the server
+knows it: the page drops its points from there on, which may have been
+drawn from a forming bar that has moved since (weekly and monthly bars are
+dated by their latest day), and appends the update with Plotly.extendTraces.
+
+Streams hold a server thread each, so STREAM_MAX_CLIENTS caps them per
+process and STREAM_MAX_SECONDS ends them now and then; EventSource
+reconnects on its own and resumes from the Last-Event-ID.
+'''
+
+import os
+import queue
+import threading
+import time
+
+import bar_store
+import serialize
+from indicators import engine
+
+# Seconds between checks of the bar store; the store itself refreshes from
+# upstream whenever its bars are older than their staleness
+STREAM_POLL = int(os.environ.get('STREAM_POLL', 30))
+# Seconds between keep-alive comments, so proxies don't drop idle streams
+STREAM_KEEPALIVE = int(os.environ.get('STREAM_KEEPALIVE', 15))
+STREAM_MAX_CLIENTS = int(os.environ.get('STREAM_MAX_CLIENTS', 4))
+STREAM_MAX_SECONDS = int(os.environ.get('STREAM_MAX_SECONDS', 15 * 60))
+# Updates a slow client may have pending before it misses newer ones
+STREAM_QUEUE = 8
+
+
+class Subscription:
+    '''One connected page: its MA period, the last bar it has and its pending updates.'''
+
+    def __init__(self, ma_period, since):
+        self.ma_period = ma_period
+        self.since = since  # epoch seconds of the page's last bar
+        self.queue = queue.Queue(maxsize=STREAM_QUEUE)
+
+
+class Poller:
+    '''Polls one (ticker, interval) while it has subscribers.'''
+
+    def __init__(self, ticker, interval):
+        self.ticker = ticker
+        self.interval = interval
+        self.subscribers = set()
+
+    def poll(self):
+        entry = bar_store.get_entry(self.ticker, self.interval)
+        bars = entry['bars'].dropna()
+        if len(bars) < 2:
+            return
+        t = serialize.epoch_seconds(bars.index)
+        # The last bar may still be forming; everything before it is final
+        last_closed = t[-2]
+
+        with _lock:
+            due = [s for s in self.subscribers if last_closed >= s.since]
+        by_period = {}
+        for subscription in due:
+            by_period.setdefault(subscription.ma_period, []).append(subscription)
+        for ma_period, subscriptions in by_period.items():
+            # One failing period must not hold back the pages on the others
+            try:
+                ma, momentum, rsi = engine.momentum_rsi((self.ticker, self.interval), bars['Close'], ma_period,
+                                                        entry.get('revised_at'))
+            except Exception as e:
+                print(f"Stream poll failed for {self.ticker} {self.interval} ma={ma_period}: {e}")
+                continue
+            columns = {
+                'close': bars['Close'].to_numpy(), 'ma': ma.to_numpy(),
+                'momentum': momentum.to_numpy(), 'rsi': rsi.to_numpy(),
+            }
+            for subscription in subscriptions:
+                start = int(t.searchsorted(subscription.since))
+                update = {'from': int(subscription.since), 't': t[start:].tolist()}
+                update.update({name: values[start:].tolist() for name, values in columns.items()})
+                _offer(subscription, int(t[-1]), serialize.dumps(update))
+
+    def run(self):
+        while True:
+            with _lock:
+                if not self.subscribers:
+                    # Unsubscribed while we slept; a new subscriber starts a new poller
+                    if _pollers.get((self.ticker, self.interval)) is self:
+                        del _pollers[(self.ticker, self.interval)]
+                    return
+            try:
+                self.poll()
+            except Exception as e:
+                print(f"Stream poll failed for {self.ticker} {self.interval}: {e}")
+            time.sleep(STREAM_POLL)
+
+
+def _offer(subscription, since, data):
+    try:
+        subscription.queue.put_nowait((since, data))
+        subscription.since = since
+    except queue.Full:
+        # Leave since alone: the next update will cover these bars as well
+        pass
+
+
+_pollers = {}  # (ticker, interval) -> Poller
+_lock = threading.Lock()
+_pid = None
+
+
+def subscribe(ticker, interval, ma_period, since):
+    '''Register a page and return its Subscription, or None if this process is at STREAM_MAX_CLIENTS.'''
+    global _pid
+    with _lock:
+        if _pid != os.getpid():
+            # Poller threads don't survive fork
+            _pollers.clear()
+            _pid = os.getpid()
+        if sum(len(p.subscribers) for p in _pollers.values()) >= STREAM_MAX_CLIENTS:
+            return None
+        subscription = Subscription(ma_period, since)
+        poller = _pollers.get((ticker, interval))
+        start = poller is None
+        if start:
+            poller = _pollers[(ticker, interval)] = Poller(ticker, interval)
+        poller.subscribers.add(subscription)
+    if start:
+        threading.Thread(target=poller.run, name=f"stream-{ticker}-{interval}", daemon=True).start()
+    return subscription
+
+
+def unsubscribe(ticker, interval, subscription):
+    with _lock:
+        poller = _pollers.get((ticker, interval))
+        if poller is not None:
+            poller.subscribers.discard(subscription)
+
+
+def events(ticker, interval, subscription):
+    '''Yield the SSE stream for subscription until STREAM_MAX_SECONDS pass.'''
+    try:
+        # Tell EventSource how soon to reconnect when the stream ends
+        yield f"retry: {STREAM_KEEPALIVE * 1000}\n\n".encode()
+        deadline = time.monotonic() + STREAM_MAX_SECONDS
+        while time.monotonic() < deadline:
+            try:
+                since, data = subscription.queue.get(timeout=STREAM_KEEPALIVE)
+            except queue.Empty:
+                yield b': keep-alive\n\n'
+                continue
+            yield b''.join([b'id: ', str(since).encode(), b'\nevent: bars\ndata: ', data, b'\n\n'])
+    finally:
+        unsubscribe(ticker, interval, subscription)
@@ -0,0 +1,105 @@
+'''
+Ticker display names, cached in SQLite so all gunicorn workers share one copy.
+
+Lookups never wait long on upstream: a stale name is served while it refreshes
+in the background, and an unknown one falls back to the ticker symbol.
+'''
+
+import os
+import sqlite3
+import threading
+import time
+
+import metrics
+import upstream
+from bar_store import CACHE_DIR
+from providers import get_provider
+
+META_DB = os.path.join(CACHE_DIR, 'metadata.sqlite')
+META_TTL = int(os.environ.get('META_TTL', 7 * 24 * 60 * 60))
+# Tickers upstream had no name for are retried sooner
+META_MISS_TTL = int(os.environ.get('META_MISS_TTL', 60 * 60))
+META_MAX_ENTRIES = int(os.environ.get('META_MAX_ENTRIES', 5000))
+# Seconds a request waits for a first-time lookup before using the symbol
+META_WAIT = float(os.environ.get('META_WAIT', 1.5))
+
+_local = threading.local()
+
+
+def _db():
+    conn = getattr(_local, 'conn', None)
+    if conn is None or _local.pid != os.getpid():
+        os.makedirs(os.path.dirname(META_DB), exist_ok=True)
+        conn = sqlite3.connect(META_DB, timeout=5, isolation_level=None)
+        conn.execute("PRAGMA journal_mode=WAL")
+        conn.execute(
+            "CREATE TABLE IF NOT EXISTS names ("
+            " ticker TEXT PRIMARY KEY, name TEXT, fetched_at REAL, last_access REAL)"
+        )
+        conn.execute("CREATE INDEX IF NOT EXISTS names_last_access ON names (last_access)")
+        _local.conn = conn
+        _local.pid = os.getpid()
+    return conn
+
+
+def _store(ticker, name):
+    now = time.time()
+    conn = _db()
+    conn.execute(
+        "INSERT OR REPLACE INTO names (ticker, name, fetched_at, last_access) VALUES (?, ?, ?, ?)",
+        (ticker, name, now, now),
+    )
+    # LRU eviction: drop the least recently used rows beyond the cap
+    conn.execute(
+        "DELETE FROM names WHERE ticker IN ("
+        " SELECT ticker FROM names ORDER BY last_access DESC LIMIT -1 OFFSET ?)",
+        (META_MAX_ENTRIES,),
+    )
+
+
+def _refresh(ticker):
+    try:
+        name = get_provider().name(ticker)
+    except Exception as e:
+        metrics.upstream_errors.inc(source='names', kind='error')
+        print(f"Metadata fetch failed for {ticker}: {e}")
+        name = None
+    _store(ticker, name)
+    return name
+
+
+def _refresh_async(ticker):
+    return upstream.submit(('name', ticker), _refresh, ticker)
+
+
+def get_name(ticker):
+    '''Return the display name for ticker, or the ticker itself if none is known yet.'''
+    now = time.time()
+    row = _db().execute(
+        "SELECT name, fetched_at, last_access FROM names WHERE ticker = ?", (ticker,)
+    ).fetchone()
+
+    if row is None:
+        metrics.cache_requests.inc(cache='names', result='miss')
+        try:
+            return _refresh_async(ticker).result(timeout=META_WAIT) or ticker
+        except Exception:
+            return ticker
+
+    metrics.cache_requests.inc(cache='names', result='hit')
+    name, fetched_at, last_access = row
+    ttl = META_TTL if name else META_MISS_TTL
+    if now - fetched_at >= ttl:
+        _refresh_async(ticker)
+    elif now - last_access > 60:
+        _db().execute("UPDATE names SET last_access = ? WHERE ticker = ?", (now, ticker))
+    return name or ticker
+
+
+def preload(tickers):
+    '''Fetch names for tickers that aren't cached yet, in the background.'''
+    conn = _db()
+    for ticker in tickers:
+        ticker = ticker.strip().upper()
+        if ticker and conn.execute("SELECT 1 FROM names WHERE ticker = ?", (ticker,)).fetchone() is None:
+            _refresh_async(ticker)
@@ -0,0 +1,129 @@
+'''
+Request timings and counters, exposed in the Prometheus text format on /metrics.
+
+Stages of a chart request are timed with stage('name'); each one is recorded
+in the chart_stage_seconds histogram and, when it finishes while the request
+is still being handled, also listed in that response's Server-Timing header.
+
+Metrics live in the worker process that served the request. Every sample
+carries a pid label so scrapes of different gunicorn workers can be told apart
+and summed.
+'''
+
+import bisect
+import os
+import threading
+import time
+from contextlib import contextmanager
+
+from flask import g, has_request_context
+
+# Seconds; covers a cached render (~1 ms) up to an upstream timeout
+BUCKETS = (0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10, 30)
+
+_registry = []
+
+
+def _labels(names, values):
+    return ','.join(f'{n}="{v}"' for n, v in zip(names, values))
+
+
+class Counter:
+
+    def __init__(self, name, doc, labelnames=()):
+        self.name = name
+        self.doc = doc
+        self.labelnames = ('pid',) + tuple(labelnames)
+        self._values = {}
+        self._lock = threading.Lock()
+        _registry.append(self)
+
+    def inc(self, amount=1, **labels):
+        key = (os.getpid(),) + tuple(labels[n] for n in self.labelnames[1:])
+        with self._lock:
+            self._values[key] = self._values.get(key, 0) + amount
+
+    def render(self):
+        lines = [f"# HELP {self.name} {self.doc}", f"# TYPE {self.name} counter"]
+        with self._lock:
+            for key, value in sorted(self._values.items()):
+                lines.append(f"{self.name}{{{_labels(self.labelnames, key)}}} {value}")
+        return lines
+
+
+class Histogram:
+
+    def __init__(self, name, doc, labelnames=(), buckets=BUCKETS):
+        self.name = name
+        self.doc = doc
+        self.labelnames = ('pid',) + tuple(labelnames)
+        self.buckets = tuple(buckets)
+        self._values = {}  # labels -> [per-bucket counts..., +Inf count, sum]
+        self._lock = threading.Lock()
+        _registry.append(self)
+
+    def observe(self, value, **labels):
+        key = (os.getpid(),) + tuple(labels[n] for n in self.labelnames[1:])
+        i = bisect.bisect_left(self.buckets, value)
+        with self._lock:
+            counts = self._values.get(key)
+            if counts is None:
+                counts = self._values[key] = [0] * (len(self.buckets) + 1) + [0.0]
+            counts[i] += 1
+            counts[-1] += value
+
+    def render(self):
+        lines = [f"# HELP {self.name} {self.doc}", f"# TYPE {self.name} histogram"]
+        with self._lock:
+            for key, counts in sorted(self._values.items()):
+                labels = _labels(self.labelnames, key)
+                total = 0
+                for bound, count in zip(self.buckets + ('+Inf',), counts):
+                    total += count
+                    lines.append(f'{self.name}_bucket{{{labels},le="{bound}"}} {total}')
+                lines.append(f"{self.name}_sum{{{labels}}} {counts[-1]}")
+                lines.append(f"{self.name}_count{{{labels}}} {total}")
+        return lines
+
+
+def render():
+    '''All metrics in the Prometheus text exposition format.'''
+    lines = []
+    for metric in _registry:
+        lines.extend(metric.render())
+    return '\n'.join(lines) + '\n'
+
+
+# --- Metrics ---
+
+request_seconds = Histogram(
+    'http_request_duration_seconds',
+    'Time until the response headers were ready (streamed bodies continue after)',
+    ['endpoint', 'status'])
+stage_seconds = Histogram(
+    'chart_stage_seconds', 'Time spent per stage of building a chart or series response', ['stage'])
+cache_requests = Counter(
+    'cache_requests_total', 'Cache lookups by cache and result (hit, miss, not_modified)', ['cache', 'result'])
+upstream_errors = Counter(
+    'upstream_errors_total', 'Failed or timed-out market-data calls', ['source', 'kind'])
+
+
+# --- Per-request timing ---
+
+@contextmanager
+def stage(name):
+    '''Time the with-block as stage name.'''
+    start = time.perf_counter()
+    try:
+        yield
+    finally:
+        elapsed = time.perf_counter() - start
+        stage_seconds.observe(elapsed, stage=name)
+        if has_request_context():
+            g.setdefault('timings', []).append((name, elapsed))
+
+
+def server_timing():
+    '''Server-Timing header value for the stages recorded so far in this request.'''
+    timings = g.get('timings', [])
+    return ', '.join(f"{name};dur={elapsed * 1000:.1f}" for name, elapsed in timings)
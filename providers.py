@@ -0,0 +1,181 @@
+'''
+Market-data providers: where OHLCV bars and ticker names come from.
+
+DATA_PROVIDER selects the backend:
+    yfinance   - Yahoo Finance (default)
+    local      - CSV/Parquet files in DATA_DIR, e.g. SPY_1d.csv or SPY.parquet
+    synthetic  - seeded random walk of SYNTHETIC_BARS bars per ticker
+'''
+
+import os
+import time
+import zlib
+
+import numpy as np
+import pandas as pd
+
+import symbols
+from upstream import UPSTREAM_TIMEOUT
+
+OHLCV_COLUMNS = ['Open', 'High', 'Low', 'Close', 'Adj Close', 'Volume']
+
+
+def normalize(data):
+    '''Flatten yfinance-style (field, ticker) columns and sort/dedupe the index.'''
+    if isinstance(data.columns, pd.MultiIndex):
+        data = data.copy()
+        data.columns = data.columns.get_level_values(0)
+    return data[~data.index.duplicated(keep='last')].sort_index()
+
+
+class MarketDataProvider:
+    '''Base class; subclasses return normalized OHLCV frames indexed by timestamp.'''
+
+    def download(self, ticker, interval, start=None):
+        raise NotImplementedError
+
+    def download_many(self, tickers, interval, start=None):
+        '''Return {ticker: frame}; backends with a bulk API should override this.'''
+        return {ticker: self.download(ticker, interval, start=start) for ticker in tickers}
+
+    def name(self, ticker):
+        return None
+
+
+class YFinanceProvider(MarketDataProvider):
+
+    def __init__(self):
+        # Imported here: yfinance is slow to import and only this provider uses it
+        import yfinance
+        self.yf = yfinance
+
+    def download(self, ticker, interval, start=None):
+        if start is None:
+            data = self.yf.download(ticker, period='max', interval=interval, auto_adjust=False,
+                                    progress=False, timeout=UPSTREAM_TIMEOUT)
+        else:
+            data = self.yf.download(ticker, start=start, interval=interval, auto_adjust=False,
+                                    progress=False, timeout=UPSTREAM_TIMEOUT)
+        return normalize(data)
+
+    def download_many(self, tickers, interval, start=None):
+        # One request for the whole list; columns come back as (ticker, field)
+        tickers = list(tickers)
+        span = {'period': 'max'} if start is None else {'start': start}
+        data = self.yf.download(tickers, interval=interval, auto_adjust=False, group_by='ticker',
+                                progress=False, timeout=UPSTREAM_TIMEOUT, **span)
+        if not isinstance(data.columns, pd.MultiIndex):
+            return {tickers[0]: normalize(data)} if len(tickers) == 1 else {}
+        present = set(data.columns.get_level_values(0))
+        return {
+            ticker: normalize(data[ticker].dropna(how='all'))
+            for ticker in tickers if ticker in present
+        }
+
+    def name(self, ticker):
+        info = self.yf.Ticker(ticker).info
+        return info.get('shortName') or info.get('longName')
+
+
+class LocalDirProvider(MarketDataProvider):
+    '''Reads {TICKER}_{interval} or {TICKER} .parquet/.csv files; names from names.csv.'''
+
+    def __init__(self, root):
+        self.root = root
+        self._names = None
+
+    def _find(self, ticker, interval):
+        symbols.check(ticker, interval)
+        for stem in (f"{ticker}_{interval}", ticker):
+            for ext in ('.parquet', '.csv'):
+                path = os.path.join(self.root, stem + ext)
+                if os.path.exists(path):
+                    return path
+        return None
+
+    def download(self, ticker, interval, start=None):
+        path = self._find(ticker, interval)
+        if path is None:
+            return pd.DataFrame(columns=OHLCV_COLUMNS)
+        if path.endswith('.parquet'):
+            data = pd.read_parquet(path)
+        else:
+            data = pd.read_csv(path, index_col=0, parse_dates=True)
+        data = normalize(data)
+        if start is not None:
+            data = data[data.index >= pd.Timestamp(start)]
+        return data
+
+    def name(self, ticker):
+        if self._names is None:
+            path = os.path.join(self.root, 'names.csv')
+            if os.path.exists(path):
+                names = pd.read_csv(path, header=None, names=['ticker', 'name'])
+                self._names = dict(zip(names['ticker'].str.upper(), names['name']))
+            else:
+                self._names = {}
+        return self._names.get(ticker)
+
+
+class RandomWalkProvider(MarketDataProvider):
+    '''Deterministic geometric random walk per ticker, ending at today's date.'''
+
+    FREQ = {'1d': 'B', '1wk': 'W-MON', '1mo': 'MS'}
+
+    def __init__(self, bars=5000, seed=0, latency=0.0):
+        self.bars = bars
+        self.seed = seed
+        # Seconds each download sleeps, to stand in for a slow upstream in load tests
+        self.latency = latency
+
+    def download(self, ticker, interval, start=None):
+        if self.latency:
+            time.sleep(self.latency)
+        rng = np.random.default_rng([self.seed, zlib.crc32(f"{ticker}:{interval}".encode())])
+        index = pd.date_range(end=pd.Timestamp.today().normalize(), periods=self.bars,
+                              freq=self.FREQ.get(interval, 'B'), name='Date')
+        close = 100 * np.exp(np.cumsum(rng.normal(0.0003, 0.012, self.bars)))
+        open_ = np.concatenate(([close[0]], close[:-1]))
+        spread = np.abs(rng.normal(0, 0.006, self.bars)) * close
+        data = pd.DataFrame({
+            'Open': open_,
+            'High': np.maximum(open_, close) + spread,
+            'Low': np.minimum(open_, close) - spread,
+            'Close': close,
+            'Adj Close': close,
+            'Volume': rng.integers(1_000_000, 10_000_000, self.bars),
+        }, index=index)
+        if start is not None:
+            data = data[data.index >= pd.Timestamp(start)]
+        return data
+
+    def name(self, ticker):
+        return f"{ticker} (synthetic)"
+
+
+_provider = None
+
+
+def get_provider():
+    global _provider
+    if _provider is None:
+        kind = os.environ.get('DATA_PROVIDER', 'yfinance')
+        if kind == 'yfinance':
+            _provider = YFinanceProvider()
+        elif kind == 'local':
+            _provider = LocalDirProvider(os.environ.get('DATA_DIR', 'data'))
+        elif kind == 'synthetic':
+            _provider = RandomWalkProvider(
+                bars=int(os.environ.get('SYNTHETIC_BARS', 5000)),
+                seed=int(os.environ.get('SYNTHETIC_SEED', 0)),
+                latency=float(os.environ.get('SYNTHETIC_LATENCY', 0)),
+            )
+        else:
+            raise ValueError(f"Unknown DATA_PROVIDER: {kind}")
+    return _provider
+
+
+def set_provider(provider):
+    '''Swap the active provider, e.g. from a benchmark or load-test script.'''
+    global _provider
+    _provider = provider
@@ -0,0 +1,32 @@
+'''
+Weekly and monthly OHLCV bars built from a daily series.
+
+Each bar covers one calendar week ending Friday (W-FRI) or one calendar month
+and is dated by the last trading day in it, so a week whose Friday is a
+holiday ends on the Thursday and the current, unfinished period is dated by
+its latest daily bar. Weeks or months without trading produce no bar.
+'''
+
+PERIODS = {'1wk': 'W-FRI', '1mo': 'M'}
+
+AGGREGATION = {
+    'Open': 'first',
+    'High': 'max',
+    'Low': 'min',
+    'Close': 'last',
+    'Adj Close': 'last',
+    'Volume': 'sum',
+}
+
+
+def resample_ohlcv(daily, interval):
+    '''Aggregate daily OHLCV bars into interval ('1wk' or '1mo') bars.'''
+    if daily.empty:
+        return daily
+    periods = daily.index.to_period(PERIODS[interval])
+    columns = {c: how for c, how in AGGREGATION.items() if c in daily.columns}
+    bars = daily.groupby(periods, sort=True).agg(columns)
+    # first/last skip NaNs; a period whose days are all NaN stays NaN
+    bars.index = daily.index.to_series().groupby(periods, sort=True).max().to_numpy()
+    bars.index.name = daily.index.name
+    return bars[list(columns)]
@@ -0,0 +1,168 @@
+'''
+Keeps the bars, names and chart pages of a watchlist warm.
+
+For each ticker in WATCHLIST and each interval in SCHEDULE_INTERVALS, bars and
+names are refreshed when a new final bar is expected: daily bars after every
+US market close, weekly bars on Saturday morning, monthly bars on the 1st.
+While the market is open the forming bar moves too, so each interval is also
+refreshed at half its bar staleness, before requests would find it stale.
+After each refresh the common /chart variants (every ma in PRERENDER_MA,
+desktop and mobile) are rendered into the chart cache. With SCREEN_REFRESH
+set, the screener's ranking table is also rebuilt that often from whatever
+the bar store holds, watchlist or not.
+
+It runs as a daemon thread in every app process, started by app.warm(). The
+bar refresh is done under a file lock, so the first worker downloads and the
+others then find fresh bars; each worker pre-renders into its own chart cache.
+It can also run as a sidecar that only refreshes the shared bar store, name
+cache and screener table:
+
+    python scheduler.py [--once]
+'''
+
+import argparse
+import datetime
+import os
+import threading
+import time
+from zoneinfo import ZoneInfo
+
+import bar_store
+import metadata
+import screener
+
+WATCHLIST = [t.strip().upper() for t in os.environ.get('WATCHLIST', '').split(',') if t.strip()]
+SCHEDULE_INTERVALS = [i for i in os.environ.get('SCHEDULE_INTERVALS', '1d,1wk,1mo').split(',') if i]
+PRERENDER_MA = [int(m) for m in os.environ.get('PRERENDER_MA', '36,200').split(',') if m]
+# Seconds between checks for due work
+SCHEDULER_TICK = int(os.environ.get('SCHEDULER_TICK', 60))
+# 0 keeps app processes from starting the thread, e.g. when a sidecar runs instead
+SCHEDULER_ENABLED = os.environ.get('SCHEDULER', '1') != '0'
+
+MARKET_TZ = ZoneInfo('America/New_York')
+MARKET_OPEN = datetime.time(9, 30)
+# The 16:00 close plus a few minutes for the final bar to settle upstream
+MARKET_SETTLED = datetime.time(16, 15)
+
+
+def last_boundary(interval, now):
+    '''Epoch seconds of the latest moment at or before now that finalized a bar of interval.
+
+    Exchange holidays are not known here; they only cost one extra refresh.
+    '''
+    local = datetime.datetime.fromtimestamp(now, MARKET_TZ)
+    day = local.date()
+    if interval == '1wk':
+        # Saturday morning, after the Friday close ended the week
+        day -= datetime.timedelta(days=(day.weekday() - 5) % 7)
+        at = datetime.datetime.combine(day, datetime.time(6, 0), MARKET_TZ)
+        if at > local:
+            at -= datetime.timedelta(days=7)
+    elif interval == '1mo':
+        at = datetime.datetime.combine(day.replace(day=1), datetime.time(6, 0), MARKET_TZ)
+        if at > local:
+            previous = day.replace(day=1) - datetime.timedelta(days=1)
+            at = datetime.datetime.combine(previous.replace(day=1), datetime.time(6, 0), MARKET_TZ)
+    else:
+        at = datetime.datetime.combine(day, MARKET_SETTLED, MARKET_TZ)
+        while at > local or at.weekday() >= 5:
+            at = datetime.datetime.combine(at.date() - datetime.timedelta(days=1), MARKET_SETTLED, MARKET_TZ)
+    return at.timestamp()
+
+
+def market_open(now):
+    local = datetime.datetime.fromtimestamp(now, MARKET_TZ)
+    return local.weekday() < 5 and MARKET_OPEN <= local.time() < MARKET_SETTLED
+
+
+class Scheduler:
+
+    def __init__(self, tickers, intervals, ma_periods, prerender=True):
+        self.tickers = tickers
+        self.intervals = intervals
+        self.ma_periods = ma_periods
+        self.prerender = prerender
+        self._boundary = {}  # interval -> last boundary handled
+        self._last_run = {}  # interval -> time of the last refresh
+        self._screened_at = 0
+
+    def due(self, interval, now):
+        if self._boundary.get(interval) != last_boundary(interval, now):
+            return True
+        return market_open(now) and now - self._last_run.get(interval, 0) >= bar_store.staleness(interval) / 2
+
+    def refresh(self, interval, now):
+        '''Refresh bars and names for the watchlist, then pre-render its charts.'''
+        boundary = last_boundary(interval, now)
+        # Bars fetched before the boundary lack the newest final bar; otherwise
+        # refresh ahead of the store's own staleness
+        max_age = max(0, min(now - boundary, bar_store.staleness(interval) / 2))
+        with bar_store.file_lock(os.path.join(bar_store.CACHE_DIR, 'scheduler')):
+            entries = bar_store.get_entries(self.tickers, interval, max_age=max_age)
+        for ticker in self.tickers:
+            # Fetches missing names and starts a refresh of expired ones
+            metadata.get_name(ticker)
+
+        rendered = 0
+        if self.prerender:
+            import app
+            for ticker in entries:
+                for ma_period in self.ma_periods:
+                    for is_mobile in (False, True):
+                        rendered += app.prerender_chart(ticker, ma_period, interval, is_mobile)
+        print(f"Scheduler refreshed {len(entries)}/{len(self.tickers)} tickers for {interval}, "
+              f"pre-rendered {rendered} charts")
+        self._boundary[interval] = boundary
+        self._last_run[interval] = now
+
+    def run_once(self):
+        now = time.time()
+        for interval in self.intervals if self.tickers else []:
+            if self.due(interval, now):
+                try:
+                    self.refresh(interval, now)
+                except Exception as e:
+                    print(f"Scheduler refresh failed for {interval}: {e}")
+        if screener.SCREEN_REFRESH and now - self._screened_at >= screener.SCREEN_REFRESH:
+            try:
+                screener.refresh_stale()
+            except Exception as e:
+                print(f"Screener refresh failed: {e}")
+            self._screened_at = now
+
+    def run_forever(self):
+        while True:
+            self.run_once()
+            time.sleep(SCHEDULER_TICK)
+
+
+_started_pid = None
+
+
+def start():
+    '''Start the scheduler thread for WATCHLIST and the screener in this process, once.'''
+    global _started_pid
+    if not (WATCHLIST or screener.SCREEN_REFRESH) or not SCHEDULER_ENABLED or _started_pid == os.getpid():
+        return
+    _started_pid = os.getpid()
+    scheduler = Scheduler(WATCHLIST, SCHEDULE_INTERVALS, PRERENDER_MA)
+    threading.Thread(target=scheduler.run_forever, name='scheduler', daemon=True).start()
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--once', action='store_true', help='refresh every interval once and exit')
+    args = parser.parse_args()
+    if not WATCHLIST and not screener.SCREEN_REFRESH:
+        parser.error("set WATCHLIST, e.g. WATCHLIST=SPY,QQQ,GLD, or SCREEN_REFRESH")
+
+    # A separate process has no chart cache to fill
+    scheduler = Scheduler(WATCHLIST, SCHEDULE_INTERVALS, PRERENDER_MA, prerender=False)
+    if args.once:
+        scheduler.run_once()
+    else:
+        scheduler.run_forever()
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,233 @@
+'''
+Momentum screener over every ticker in the local bar store.
+
+refresh() computes each stored ticker's latest MA, Momentum and RSI with the
+same momentum_rsi() the charts use, for every period in SCREEN_MA, and
+replaces that interval's rows of a SQLite ranking table in one transaction.
+Tickers are split into chunks of SCREEN_CHUNK and scanned on a pool of
+SCREEN_PROCESSES processes; each reads the memory-mapped bar files itself,
+so no bars are pickled between processes. Only the last
+max(ma, RSI_PERIOD + 1) closes of a ticker are needed for its latest values.
+
+query() and /api/screen then only filter and sort the table. With
+SCREEN_REFRESH set, the scheduler refreshes it that often; from the command
+line:
+
+    python screener.py [--refresh] [--interval 1d] [--ma 200] [--sort -momentum]
+                       [--min-rsi 50] [--above-ma] [--limit 20]
+'''
+
+import argparse
+import math
+import multiprocessing
+import os
+import sqlite3
+import time
+from concurrent.futures import ProcessPoolExecutor
+
+import bar_store
+
+SCREEN_DB = os.path.join(bar_store.CACHE_DIR, 'screener.sqlite')
+SCREEN_INTERVALS = [i for i in os.environ.get('SCREEN_INTERVALS', '1d').split(',') if i]
+SCREEN_MA = [int(m) for m in os.environ.get('SCREEN_MA', '36,200').split(',') if m]
+# Tickers per pool task; a store smaller than one chunk is scanned in-process,
+# as starting the pool costs more than the scan
+SCREEN_CHUNK = int(os.environ.get('SCREEN_CHUNK', 500))
+# Each process imports pandas and maps its chunk's series; keep the default
+# small enough for a web worker's memory
+SCREEN_PROCESSES = int(os.environ.get('SCREEN_PROCESSES', min(os.cpu_count() or 1, 2)))
+# Seconds between refreshes by the scheduler, e.g. 900; 0 (the default) leaves
+# it to the CLI or a sidecar
+SCREEN_REFRESH = int(os.environ.get('SCREEN_REFRESH', 0))
+SCREEN_MAX_LIMIT = 1000
+
+# query() sort keys and range filters, mapped to table columns
+SORT_COLUMNS = {'ticker': 'ticker', 'close': 'close', 'ma': 'ma', 'momentum': 'momentum', 'rsi': 'rsi', 't': 't'}
+RANGE_FILTERS = {
+    'min_momentum': 'momentum >= ?', 'max_momentum': 'momentum <= ?',
+    'min_rsi': 'rsi >= ?', 'max_rsi': 'rsi <= ?',
+}
+
+SCHEMA = '''
+CREATE TABLE IF NOT EXISTS screen (
+    interval TEXT NOT NULL,
+    period INTEGER NOT NULL,
+    ticker TEXT NOT NULL,
+    t INTEGER NOT NULL,
+    close REAL NOT NULL,
+    ma REAL NOT NULL,
+    momentum REAL NOT NULL,
+    rsi REAL NOT NULL,
+    PRIMARY KEY (interval, period, ticker)
+);
+CREATE INDEX IF NOT EXISTS screen_momentum ON screen (interval, period, momentum);
+CREATE INDEX IF NOT EXISTS screen_rsi ON screen (interval, period, rsi);
+CREATE TABLE IF NOT EXISTS screen_runs (
+    interval TEXT PRIMARY KEY,
+    updated_at REAL NOT NULL,
+    tickers INTEGER NOT NULL,
+    seconds REAL NOT NULL
+);
+'''
+
+
+def connect():
+    os.makedirs(os.path.dirname(SCREEN_DB), exist_ok=True)
+    db = sqlite3.connect(SCREEN_DB, timeout=30)
+    # Readers keep reading the old rows while a refresh writes the new ones
+    db.execute('PRAGMA journal_mode=WAL')
+    db.executescript(SCHEMA)
+    return db
+
+
+def scan(tickers, interval, periods):
+    '''Latest (ticker, period, t, close, ma, momentum, rsi) rows for tickers from the store.'''
+    from indicators import align_right, momentum_rsi, warmup_bars
+    from serialize import epoch_seconds
+
+    tail = warmup_bars(max(periods)) + 1
+    closes = {}
+    for ticker in tickers:
+        entry = bar_store.stored(ticker, interval)
+        if entry is not None:
+            # A copy, so the file is unmapped as soon as the entry goes
+            close = entry['bars'].dropna()['Close'].iloc[-tail:].copy()
+            if not close.empty:
+                closes[ticker] = close
+    if not closes:
+        return []
+
+    # Row -1 of the aligned panel is every ticker's latest bar
+    panel = align_right(closes)
+    last = panel.iloc[-1]
+    times = {ticker: int(epoch_seconds(close.index[-1:])[0]) for ticker, close in closes.items()}
+    rows = []
+    for period in periods:
+        ma, momentum, rsi = (frame.iloc[-1] for frame in momentum_rsi(panel, period))
+        for ticker in closes:
+            values = (float(last[ticker]), float(ma[ticker]), float(momentum[ticker]), float(rsi[ticker]))
+            # Histories shorter than the MA period have no value yet
+            if not any(math.isnan(v) for v in values):
+                rows.append((ticker, period, times[ticker]) + values)
+    return rows
+
+
+def _chunks(items, size):
+    return [items[i:i + size] for i in range(0, len(items), size)]
+
+
+def refresh(interval, periods=None):
+    '''Rescan every stored ticker for interval and replace its rows in the table.
+
+    Returns the number of tickers ranked.
+    '''
+    periods = periods or SCREEN_MA
+    started = time.time()
+    chunks = _chunks(bar_store.stored_tickers(interval), SCREEN_CHUNK)
+    if len(chunks) <= 1 or SCREEN_PROCESSES <= 1:
+        # Not worth starting processes for
+        rows = [row for chunk in chunks for row in scan(chunk, interval, periods)]
+    else:
+        # spawn, not fork: the app processes run threads, which fork doesn't copy safely
+        context = multiprocessing.get_context('spawn')
+        with ProcessPoolExecutor(min(SCREEN_PROCESSES, len(chunks)), mp_context=context) as pool:
+            results = pool.map(scan, chunks, [interval] * len(chunks), [periods] * len(chunks))
+            rows = [row for result in results for row in result]
+
+    ranked = len({row[0] for row in rows})
+    db = connect()
+    try:
+        # One transaction: queries see either the old ranking or the new one
+        with db:
+            db.execute('DELETE FROM screen WHERE interval = ?', (interval,))
+            db.executemany('INSERT INTO screen (ticker, period, t, close, ma, momentum, rsi, interval) '
+                           'VALUES (?, ?, ?, ?, ?, ?, ?, ?)', [row + (interval,) for row in rows])
+            db.execute('INSERT OR REPLACE INTO screen_runs VALUES (?, ?, ?, ?)',
+                       (interval, time.time(), ranked, time.time() - started))
+    finally:
+        db.close()
+    print(f"Screener ranked {ranked} tickers for {interval} in {time.time() - started:.1f}s")
+    return ranked
+
+
+def refresh_stale(max_age=SCREEN_REFRESH):
+    '''Refresh each of SCREEN_INTERVALS whose ranking is older than max_age seconds.'''
+    # Every app process runs a scheduler; the lock and the age check let only one of them scan
+    with bar_store.file_lock(SCREEN_DB):
+        for interval in SCREEN_INTERVALS:
+            run = status(interval)
+            if run is None or time.time() - run['updated_at'] >= max_age:
+                refresh(interval)
+
+
+def status(interval):
+    '''{'updated_at', 'tickers', 'seconds'} of interval's last refresh, or None.'''
+    db = connect()
+    try:
+        row = db.execute('SELECT updated_at, tickers, seconds FROM screen_runs WHERE interval = ?',
+                         (interval,)).fetchone()
+    finally:
+        db.close()
+    return None if row is None else {'updated_at': row[0], 'tickers': row[1], 'seconds': row[2]}
+
+
+def query(interval='1d', period=200, sort='-momentum', limit=50, above_ma=None, **ranges):
+    '''Ranked rows for (interval, period) as dicts.
+
+    sort is a column, prefixed with '-' for descending; ranges are any of
+    RANGE_FILTERS (min_rsi=50, max_momentum=0.2, ...); above_ma True/False
+    keeps tickers closing above/below their MA.
+    '''
+    column = SORT_COLUMNS.get(sort.lstrip('-'))
+    if column is None:
+        raise ValueError(f"Unknown sort {sort!r}; expected one of {', '.join(SORT_COLUMNS)}")
+    if not 1 <= limit <= SCREEN_MAX_LIMIT:
+        raise ValueError(f"limit must be between 1 and {SCREEN_MAX_LIMIT}")
+    where = ['interval = ?', 'period = ?']
+    params = [interval, period]
+    for name, value in ranges.items():
+        if name not in RANGE_FILTERS:
+            raise ValueError(f"Unknown filter {name!r}")
+        if value is not None:
+            where.append(RANGE_FILTERS[name])
+            params.append(value)
+    if above_ma is not None:
+        where.append('close > ma' if above_ma else 'close <= ma')
+
+    sql = (f"SELECT ticker, t, close, ma, momentum, rsi FROM screen WHERE {' AND '.join(where)} "
+           f"ORDER BY {column} {'DESC' if sort.startswith('-') else 'ASC'}, ticker LIMIT ?")
+    db = connect()
+    try:
+        rows = db.execute(sql, params + [limit]).fetchall()
+    finally:
+        db.close()
+    names = ('ticker', 't', 'close', 'ma', 'momentum', 'rsi')
+    return [dict(zip(names, row)) for row in rows]
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--refresh', action='store_true', help='rescan the bar store first')
+    parser.add_argument('--interval', default='1d')
+    parser.add_argument('--ma', type=int, default=200)
+    parser.add_argument('--sort', default='-momentum')
+    parser.add_argument('--min-momentum', type=float)
+    parser.add_argument('--max-momentum', type=float)
+    parser.add_argument('--min-rsi', type=float)
+    parser.add_argument('--max-rsi', type=float)
+    parser.add_argument('--above-ma', action='store_true')
+    parser.add_argument('--limit', type=int, default=20)
+    args = parser.parse_args()
+
+    if args.refresh or status(args.interval) is None:
+        refresh(args.interval, sorted(set(SCREEN_MA) | {args.ma}))
+    rows = query(args.interval, args.ma, args.sort, args.limit, above_ma=True if args.above_ma else None,
+                 min_momentum=args.min_momentum, max_momentum=args.max_momentum,
+                 min_rsi=args.min_rsi, max_rsi=args.max_rsi)
+    print(f"{'ticker':8s} {'close':>10s} {'ma':>10s} {'momentum':>9s} {'rsi':>6s}")
+    for row in rows:
+        print(f"{row['ticker']:8s} {row['close']:10.2f} {row['ma']:10.2f} {row['momentum']:9.4f} {row['rsi']:6.1f}")
+
+
+if __name__ == '__main__':
+    main()
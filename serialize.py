@@ -0,0 +1,103 @@
+'''
+Compact encodings of indicator series for the data API.
+
+    json   - {ticker, interval, ma, series: {t, close, ...}}, timestamps as
+             epoch seconds
+    f32    - raw little-endian arrays: int64 timestamps, then one float32 array
+             per column; layout and ticker/interval/ma in the X-Series-*
+             response headers
+    arrow  - Arrow IPC stream (needs pyarrow)
+
+Chart pages use the same idea: trace arrays are sent as Plotly typed arrays
+(base64 of the raw little-endian buffer) with dates as epoch milliseconds.
+'''
+
+import base64
+import json
+
+import numpy as np
+
+try:
+    import orjson
+except ImportError:
+    orjson = None
+
+try:
+    import pyarrow as pa
+except ImportError:
+    pa = None
+
+SERIES_COLUMNS = ['Close', 'MA', 'Momentum', 'RSI']
+FORMATS = ('json', 'f32', 'arrow')
+
+
+def epoch_seconds(index):
+    return index.values.astype('datetime64[s]').astype(np.int64)
+
+
+def epoch_millis(index):
+    return index.values.astype('datetime64[ms]').astype(np.int64)
+
+
+def typed_array(values):
+    '''Plotly.js typed-array spec: float64 values as base64, no per-element text.'''
+    buffer = np.ascontiguousarray(values, dtype='<f8')
+    spec = {'dtype': 'f8', 'bdata': base64.b64encode(buffer).decode('ascii')}
+    if buffer.ndim > 1:
+        # Row-major 2-D data, e.g. a heatmap's z
+        spec['shape'] = ', '.join(str(n) for n in buffer.shape)
+    return spec
+
+
+def dumps(obj):
+    '''Compact JSON bytes; orjson when installed, stdlib json otherwise.'''
+    if orjson is not None:
+        return orjson.dumps(obj, option=orjson.OPT_SERIALIZE_NUMPY)
+    return json.dumps(obj, separators=(',', ':')).encode()
+
+
+def encode_json(data, meta, columns=SERIES_COLUMNS):
+    # The arrays get their own object, so a column can't shadow a meta field (ma)
+    series = {'t': epoch_seconds(data.index).tolist()}
+    for column in columns:
+        series[column.lower()] = data[column].to_numpy(dtype=np.float64).tolist()
+    return dumps(dict(meta, series=series)), 'application/json', {}
+
+
+def encode_f32(data, meta, columns=SERIES_COLUMNS):
+    parts = [epoch_seconds(data.index).astype('<i8').tobytes()]
+    for column in columns:
+        parts.append(data[column].to_numpy(dtype='<f4').tobytes())
+    headers = {
+        'X-Series-Rows': str(len(data)),
+        'X-Series-Columns': ','.join(['t:int64'] + [f"{c.lower()}:float32" for c in columns]),
+    }
+    # X-Series-Ticker, X-Series-Interval, X-Series-Ma (comma-separated for a sweep)
+    for name, value in meta.items():
+        value = ','.join(str(v) for v in value) if isinstance(value, (list, tuple)) else str(value)
+        headers[f"X-Series-{name.title()}"] = value
+    return b''.join(parts), 'application/octet-stream', headers
+
+
+def encode_arrow(data, meta, columns=SERIES_COLUMNS):
+    if pa is None:
+        raise ValueError("format=arrow needs pyarrow installed on the server")
+    arrays = [pa.array(epoch_seconds(data.index))]
+    arrays += [pa.array(data[c].to_numpy(dtype=np.float32)) for c in columns]
+    schema_meta = {k: str(v) for k, v in meta.items()}
+    table = pa.Table.from_arrays(arrays, names=['t'] + [c.lower() for c in columns]).replace_schema_metadata(schema_meta)
+    sink = pa.BufferOutputStream()
+    with pa.ipc.new_stream(sink, table.schema) as writer:
+        writer.write_table(table)
+    return sink.getvalue().to_pybytes(), 'application/vnd.apache.arrow.stream', {}
+
+
+def encode_series(data, meta, fmt, columns=SERIES_COLUMNS):
+    '''Return (body, mimetype, extra headers) for the indicator columns of data.'''
+    if fmt == 'json':
+        return encode_json(data, meta, columns)
+    if fmt == 'f32':
+        return encode_f32(data, meta, columns)
+    if fmt == 'arrow':
+        return encode_arrow(data, meta, columns)
+    raise ValueError(f"Unknown format {fmt!r}; expected one of {', '.join(FORMATS)}")
@@ -0,0 +1,22 @@
+'''
+Validation of the ticker and interval query parameters.
+
+Both end up in file names in the bar store and the local data directory, so
+anything that isn't a plain symbol or a known bar size is refused before it
+gets near the file system or upstream.
+'''
+
+import re
+
+# SPY, BRK-B, BRK.B, ^GSPC, EURUSD=X, 7203.T; no path separators
+SYMBOL = re.compile(r'[A-Z0-9.^=-]{1,20}')
+# Bar sizes Yahoo serves
+INTERVALS = ('1m', '2m', '5m', '15m', '30m', '60m', '90m', '1h', '1d', '5d', '1wk', '1mo', '3mo')
+
+
+def check(ticker, interval=None):
+    '''Raise ValueError unless ticker is a symbol and interval (if given) a known bar size.'''
+    if not isinstance(ticker, str) or SYMBOL.fullmatch(ticker) is None:
+        raise ValueError(f"Bad ticker {ticker!r}")
+    if interval is not None and interval not in INTERVALS:
+        raise ValueError(f"Unknown interval {interval!r}; expected one of {', '.join(INTERVALS)}")
@@ -0,0 +1,7 @@
+import os
+import sys
+
+# The app is a set of top-level modules, not a package
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+# Importing app must not start warm-up threads that reach upstream
+os.environ.setdefault('WARM_ON_IMPORT', '0')
@@ -0,0 +1,95 @@
+'''
+bar_store bookkeeping that callers rely on, without upstream.
+'''
+
+import numpy as np
+import pandas as pd
+import pytest
+
+import bar_store
+from providers import OHLCV_COLUMNS
+
+
+def bars(n, seed=0):
+    rng = np.random.default_rng(seed)
+    close = 100 * np.exp(np.cumsum(rng.normal(0, 0.01, n)))
+    index = pd.date_range('2020-01-01', periods=n, freq='B', name='Date')
+    return pd.DataFrame({c: close for c in OHLCV_COLUMNS}, index=index)
+
+
+@pytest.fixture
+def store(tmp_path, monkeypatch):
+    monkeypatch.setattr(bar_store, 'BAR_DIR', str(tmp_path))
+    return bar_store._path('SPY', '1d')
+
+
+def test_revised_at_moves_only_for_closed_bars(store):
+    entry = bar_store._save(store, None, bars(50), 1000.0, 1000.0)
+    assert entry['revised_at'] == 1000.0
+
+    # New bars and a revised last bar leave the closed ones alone
+    grown = bars(52)
+    grown.iloc[49, grown.columns.get_loc('Close')] *= 1.01
+    entry = bar_store._save(store, entry, grown, 2000.0, 1000.0)
+    assert entry['revised_at'] == 1000.0
+
+    # So does a full download with the same history
+    entry = bar_store._save(store, entry, grown, 3000.0, 3000.0)
+    assert entry['revised_at'] == 1000.0
+
+    revised = grown.copy()
+    revised.iloc[10, revised.columns.get_loc('Close')] *= 0.98
+    entry = bar_store._save(store, entry, revised, 4000.0, 1000.0)
+    assert entry['revised_at'] == 4000.0
+
+
+def closes(n, seed=0):
+    frame = bars(n, seed)
+    frame.iloc[n // 2] = np.nan  # a gap in the provider's data
+    return frame
+
+
+@pytest.mark.parametrize('ma_period', [5, 50, 200])
+@pytest.mark.parametrize('span', [
+    {'start': pd.Timestamp('2020-06-01')},
+    {'start': pd.Timestamp('2020-06-01'), 'end': pd.Timestamp('2021-01-15')},
+    {'lookback': 120},
+    {'lookback': pd.DateOffset(months=6)},
+    {'end': pd.Timestamp('2021-01-15'), 'lookback': pd.DateOffset(years=1)},
+])
+def test_window_values_match_full_history(ma_period, span):
+    from indicators import add_indicators, warmup_bars
+
+    full = closes(600)
+    cut, first = bar_store.window(full, warmup_bars(ma_period), **span)
+    want = add_indicators(full.dropna(), ma_period)
+    got = add_indicators(cut.copy(), ma_period)
+    want = want[(want.index >= first) & (want.index <= cut.index[-1])]
+    got = got[got.index >= first]
+    pd.testing.assert_frame_equal(got, want)
+    # Where the history has the warm-up bars, every drawn bar has its indicators
+    if full.dropna().index.get_loc(first) >= warmup_bars(ma_period):
+        assert not got[['MA', 'Momentum', 'RSI']].isna().any().any()
+
+
+def test_window_bar_count_and_offsets():
+    full = closes(100)
+    kept = full.dropna()
+    cut, first = bar_store.window(full, 10, lookback=20)
+    assert first == kept.index[-20] and len(cut) == 30
+    # More bars than there are: everything, without warm-up before the start
+    cut, first = bar_store.window(full, 10, lookback=500)
+    assert first == kept.index[0] and len(cut) == len(kept)
+    # An offset keeps the bars after last - offset
+    cut, first = bar_store.window(full, 0, lookback=pd.DateOffset(weeks=2))
+    assert first == kept.index[kept.index > kept.index[-1] - pd.DateOffset(weeks=2)][0]
+    assert first > kept.index[-1] - pd.DateOffset(weeks=2)
+
+
+def test_window_outside_the_history():
+    full = closes(50)
+    assert bar_store.window(full, 5, start=full.index[-1] + pd.Timedelta(days=1))[1] is None
+    cut, first = bar_store.window(full, 5, end=full.index[0] - pd.Timedelta(days=1))
+    assert first is None and cut.empty
+    cut, first = bar_store.window(full.iloc[:0], 5)
+    assert first is None and cut.empty
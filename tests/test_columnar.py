@@ -0,0 +1,77 @@
+'''
+columnar.write() and read() round trips.
+'''
+
+import json
+
+import numpy as np
+import pandas as pd
+import pytest
+
+import columnar
+
+
+def frame(n, tz=None, unit='ns'):
+    index = pd.date_range('2024-01-02 09:30', periods=n, freq='5min', tz=tz, name='Datetime').as_unit(unit)
+    rng = np.random.default_rng(n)
+    return pd.DataFrame({
+        'Close': rng.random(n).astype('float32'),
+        'Volume': rng.integers(0, 2**40, n).astype('float64'),
+    }, index=index)
+
+
+@pytest.mark.parametrize('tz', [None, 'UTC', 'America/New_York'])
+@pytest.mark.parametrize('unit', ['s', 'us', 'ns'])
+@pytest.mark.parametrize('n', [0, 1, 7, 8])
+def test_round_trip(tmp_path, tz, unit, n):
+    bars = frame(n, tz, unit)
+    path = str(tmp_path / 'x.bars')
+    columnar.write(path, bars, {'version': 'v1', 'at': 1.5}, {'Volume': '<f8'})
+    got, meta, _ = columnar.read(path)
+    pd.testing.assert_frame_equal(got, bars, check_freq=False)
+    assert got.index.unit == unit and str(got.index.tz) == str(tz)
+    assert meta == {'version': 'v1', 'at': 1.5}
+
+
+def test_float64_columns_keep_whole_volumes(tmp_path):
+    bars = frame(3)
+    bars['Volume'] = [2.0**24 + 1, 2.0**40 + 3, np.nan]
+    path = str(tmp_path / 'x.bars')
+    columnar.write(path, bars, {}, {'Volume': '<f8'})
+    assert columnar.read(path)[0]['Volume'].tolist()[:2] == [2.0**24 + 1, 2.0**40 + 3]
+    # Without a dtype a column is float32
+    columnar.write(path, bars, {})
+    assert columnar.read(path)[0]['Volume'].dtype == np.float32
+
+
+def test_columns_are_views_of_the_mapping(tmp_path):
+    path = str(tmp_path / 'x.bars')
+    columnar.write(path, frame(9), {}, {'Volume': '<f8'})
+    bars, _, mapping = columnar.read(path)
+    whole = np.frombuffer(mapping, dtype='u1')
+    for column in bars:
+        assert np.shares_memory(bars[column].to_numpy(), whole)
+    assert np.shares_memory(bars.index.asi8, whole)
+
+
+def test_reads_files_without_dtypes(tmp_path):
+    # The first layout: no dtypes in the header and unpadded float32 runs
+    bars = frame(7)
+    header = {'rows': 7, 'columns': ['Close', 'Volume'], 'unit': 'ns', 'tz': None, 'name': 'Datetime',
+              'meta': {'version': 'old'}}
+    encoded = json.dumps(header).encode()
+    encoded += b' ' * (-(len(columnar.MAGIC) + 4 + len(encoded)) % 8)
+    path = tmp_path / 'old.bars'
+    path.write_bytes(columnar.MAGIC + len(encoded).to_bytes(4, 'little') + encoded
+                     + bars.index.asi8.astype('<i8').tobytes()
+                     + bars.to_numpy(dtype='<f4').T.tobytes())
+    got, meta, _ = columnar.read(str(path))
+    pd.testing.assert_frame_equal(got, bars.astype('float32'), check_freq=False)
+    assert meta == {'version': 'old'}
+
+
+def test_rejects_other_files(tmp_path):
+    path = tmp_path / 'x.bars'
+    path.write_bytes(b'not bars at all')
+    with pytest.raises(ValueError):
+        columnar.read(str(path))
@@ -0,0 +1,80 @@
+'''
+lttb_indices() against a plain one-point-at-a-time LTTB.
+'''
+
+import numpy as np
+import pandas as pd
+import pytest
+
+import downsample
+from downsample import lttb_indices, lttb_series
+
+
+def naive(x, y, n_out):
+    n = len(y)
+    if n_out >= n or n_out < 3:
+        return list(range(n))
+    edges = np.linspace(1, n - 1, n_out - 1).astype(np.int64).tolist()
+    keep = [0]
+    for i in range(n_out - 2):
+        lo, hi = edges[i], edges[i + 1]
+        if i + 2 < n_out - 1:
+            nlo, nhi = edges[i + 1], edges[i + 2]
+            ax = sum(x[nlo:nhi]) / (nhi - nlo)
+            ay = sum(y[nlo:nhi]) / (nhi - nlo)
+        else:
+            ax, ay = x[-1], y[-1]
+        a = keep[-1]
+        best, pick = -1.0, lo
+        for j in range(lo, hi):
+            area = abs((x[a] - ax) * (y[j] - y[a]) - (x[a] - x[j]) * (ay - y[a]))
+            # The first of equal areas, like argmax
+            if area > best:
+                best, pick = area, j
+        keep.append(pick)
+    return keep + [n - 1]
+
+
+def series(n, seed, ties=False):
+    rng = np.random.default_rng(seed)
+    x = np.arange(n) * 86400e9 + 1.7e18
+    y = rng.integers(0, 3, n).astype(np.float64) if ties else np.cumsum(rng.normal(size=n))
+    return x, y
+
+
+@pytest.mark.parametrize('n, n_out', [
+    (1000, 100),    # narrow buckets, scored as a table
+    (1602, 102),    # 16 points a bucket: the widest table
+    (1702, 102),    # 17: bucket by bucket
+    (20000, 300),   # wide
+    (10, 3), (10, 9), (10, 10), (10, 50), (10, 2),
+])
+@pytest.mark.parametrize('ties', [False, True])
+def test_matches_naive(n, n_out, ties):
+    x, y = series(n, n + n_out, ties)
+    got = lttb_indices(x, y, n_out)
+    assert got.tolist() == naive(x.tolist(), y.tolist(), n_out)
+
+
+def test_uneven_buckets_and_chunks(monkeypatch):
+    # A few pair scores per call, so the table is built in many chunks
+    monkeypatch.setattr(downsample, 'TABLE_CHUNK', 100)
+    rng = np.random.default_rng(7)
+    for _ in range(20):
+        n = int(rng.integers(50, 3000))
+        n_out = int(rng.integers(3, n))
+        x = np.sort(rng.random(n)) * 1e18
+        y = np.cumsum(rng.normal(size=n))
+        assert lttb_indices(x, y, n_out).tolist() == naive(x.tolist(), y.tolist(), n_out)
+
+
+def test_series_drops_nans_and_keeps_the_ends():
+    index = pd.date_range('2000-01-03', periods=5000, freq='B')
+    values = pd.Series(np.cumsum(np.random.default_rng(3).normal(size=5000)), index=index)
+    values.iloc[::7] = np.nan
+    out = lttb_series(values, 500)
+    assert len(out) == 500
+    assert not out.isna().any()
+    assert out.index[0] == values.dropna().index[0] and out.index[-1] == index[-1]
+    assert out.index.is_monotonic_increasing
+    assert lttb_series(values, None).equals(values.dropna())
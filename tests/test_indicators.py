@@ -0,0 +1,93 @@
+'''
+IndicatorEngine against the momentum_rsi() pandas reference.
+'''
+
+import numpy as np
+import pandas as pd
+import pytest
+
+from indicators import RSI_PERIOD, IndicatorEngine, momentum_rsi
+
+MA_PERIODS = [1, 2, 5, 14, 20, 50, 200]
+
+
+def walk(n, seed=0):
+    rng = np.random.default_rng(seed)
+    index = pd.date_range('2000-01-03', periods=n, freq='B')
+    return pd.Series(100 * np.exp(np.cumsum(rng.normal(0, 0.01, n))), index=index)
+
+
+def assert_matches(engine, key, close, ma_period, revision=None):
+    got = engine.momentum_rsi(key, close, ma_period, revision)
+    want = momentum_rsi(close, ma_period)
+    for name, g, w in zip(('ma', 'momentum', 'rsi'), got, want):
+        assert g.index.equals(w.index), name
+        np.testing.assert_allclose(g.to_numpy(), w.to_numpy(), rtol=1e-9, atol=1e-12, equal_nan=True,
+                                   err_msg=f"{name} ma={ma_period} n={len(close)}")
+
+
+@pytest.mark.parametrize('ma_period', MA_PERIODS)
+def test_full_history(ma_period):
+    assert_matches(IndicatorEngine(), 'k', walk(600), ma_period)
+
+
+@pytest.mark.parametrize('ma_period', MA_PERIODS)
+def test_appended_bars(ma_period):
+    engine = IndicatorEngine()
+    close = walk(700, seed=1)
+    for n in (300, 301, 302, 310, 450, 700):
+        assert_matches(engine, 'k', close.iloc[:n], ma_period)
+
+
+@pytest.mark.parametrize('ma_period', MA_PERIODS)
+def test_revised_last_bar(ma_period):
+    engine = IndicatorEngine()
+    close = walk(400, seed=2)
+    assert_matches(engine, 'k', close, ma_period)
+    for factor in (1.01, 0.97, 1.0):
+        revised = close.copy()
+        revised.iloc[-1] *= factor
+        assert_matches(engine, 'k', revised, ma_period)
+    # A revised bar that was already committed comes with a new revision, which forces a rebuild
+    revised = close.copy()
+    revised.iloc[-5] *= 1.02
+    assert_matches(engine, 'k', revised, ma_period, revision=2)
+
+
+@pytest.mark.parametrize('ma_period', [5, 20, 50])
+def test_flat_windows(ma_period):
+    engine = IndicatorEngine()
+    index = pd.date_range('2000-01-03', periods=300, freq='B')
+    values = np.concatenate((np.full(100, 50.0), np.linspace(50, 60, 60), np.full(140, 60.0)))
+    close = pd.Series(values, index=index)
+    for n in (50, 120, 200, 300):
+        assert_matches(engine, 'k', close.iloc[:n], ma_period)
+
+
+@pytest.mark.parametrize('ma_period', MA_PERIODS)
+@pytest.mark.parametrize('n', [1, 2, RSI_PERIOD - 1, RSI_PERIOD, RSI_PERIOD + 1, 30, 199, 200])
+def test_short_series(ma_period, n):
+    engine = IndicatorEngine()
+    close = walk(n, seed=3)
+    assert_matches(engine, 'k', close, ma_period)
+    assert_matches(engine, 'k', walk(n + 3, seed=3), ma_period)
+
+
+def test_empty_series():
+    ma, momentum, rsi = IndicatorEngine().momentum_rsi('k', pd.Series([], dtype='float64'), 20)
+    assert ma.empty and momentum.empty and rsi.empty
+
+
+def test_randomized():
+    rng = np.random.default_rng(42)
+    engine = IndicatorEngine(max_series=8)
+    for case in range(200):
+        key = f"k{rng.integers(12)}"
+        ma_period = int(rng.choice(MA_PERIODS))
+        # Walks of one seed extend each other; another seed is a revised history
+        seed = int(rng.integers(5))
+        close = walk(int(rng.integers(1, 400)), seed=seed)
+        if rng.random() < 0.3:
+            close = close.copy()
+            close.iloc[-1] *= 1 + rng.normal(0, 0.02)
+        assert_matches(engine, key, close, ma_period, revision=seed)
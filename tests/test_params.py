@@ -0,0 +1,60 @@
+'''
+Query parameter parsing in app.py.
+'''
+
+import pandas as pd
+import pytest
+
+from app import MA_SWEEP_MAX, _parse_ma, _parse_span
+
+
+@pytest.mark.parametrize('value, periods', [
+    ('200', [200]),
+    (' 36 ', [36]),
+    ('50,20,50,200', [20, 50, 200]),
+    ('10,', [10]),
+    ('10:50:20', [10, 30, 50]),
+    ('10:12', [10, 11, 12]),
+    (f"1:{MA_SWEEP_MAX}", list(range(1, MA_SWEEP_MAX + 1))),
+])
+def test_parse_ma(value, periods):
+    assert _parse_ma(value) == periods
+
+
+@pytest.mark.parametrize('value', [
+    '0', '-5', '10,0', '', ',', 'x', '1.5', '10:5', '10:20:0', '1:2:3:4',
+    f"1:{MA_SWEEP_MAX + 1}", ','.join(str(p) for p in range(1, MA_SWEEP_MAX + 2)),
+])
+def test_parse_ma_rejects(value):
+    with pytest.raises(ValueError):
+        _parse_ma(value)
+
+
+def test_parse_ma_checks_the_count_before_building():
+    # Would take gigabytes as a list
+    with pytest.raises(ValueError, match='At most'):
+        _parse_ma('1:10000000000')
+
+
+@pytest.mark.parametrize('lookback, expected', [
+    ('500', 500),
+    ('90d', pd.DateOffset(days=90)),
+    ('6W', pd.DateOffset(weeks=6)),
+    ('18mo', pd.DateOffset(months=18)),
+    (' 2y ', pd.DateOffset(years=2)),
+])
+def test_parse_span_lookback(lookback, expected):
+    assert _parse_span({'lookback': lookback}) == (None, None, expected)
+
+
+def test_parse_span_dates():
+    start, end, lookback = _parse_span({'start': '2020-01-01', 'end': '2024-12-31'})
+    assert (start, end, lookback) == (pd.Timestamp('2020-01-01'), pd.Timestamp('2024-12-31'), None)
+    assert _parse_span({}) == (None, None, None)
+    assert _parse_span({'start': '', 'lookback': ''}) == (None, None, None)
+
+
+@pytest.mark.parametrize('args', [{'lookback': '2q'}, {'lookback': '-5'}, {'lookback': '1.5y'}, {'start': 'soon'}])
+def test_parse_span_rejects(args):
+    with pytest.raises(ValueError):
+        _parse_span(args)
@@ -0,0 +1,68 @@
+'''
+resample_ohlcv() on hand-built daily bars.
+'''
+
+import numpy as np
+import pandas as pd
+
+from resample import resample_ohlcv
+
+
+def daily(start, end, holidays=()):
+    '''Business days in [start, end] less holidays; day i opens at i and trades 1000 * (i + 1).'''
+    index = pd.bdate_range(start, end, name='Date').drop(pd.DatetimeIndex(holidays))
+    i = np.arange(len(index), dtype=np.float64)
+    return pd.DataFrame({
+        'Open': i, 'High': i + 10, 'Low': i - 10, 'Close': i + 0.5, 'Adj Close': i + 0.25,
+        'Volume': 1000 * (i + 1),
+    }, index=index)
+
+
+def test_week_with_a_holiday_friday_ends_thursday():
+    # Good Friday 2024-03-29
+    days = daily('2024-03-18', '2024-04-05', holidays=['2024-03-29'])
+    weeks = resample_ohlcv(days, '1wk')
+    assert list(weeks.index) == [pd.Timestamp(d) for d in ('2024-03-22', '2024-03-28', '2024-04-05')]
+    week = weeks.loc['2024-03-28']
+    # Days 5..8 of the series, Monday to Thursday
+    assert (week['Open'], week['High'], week['Low'], week['Close']) == (5, 18, -5, 8.5)
+    assert week['Adj Close'] == 8.25
+    assert week['Volume'] == 1000 * (6 + 7 + 8 + 9)
+
+
+def test_month_ending_mid_week():
+    # January 2024 ends on a Wednesday; that week runs into February
+    days = daily('2024-01-22', '2024-02-09')
+    months = resample_ohlcv(days, '1mo')
+    assert list(months.index) == [pd.Timestamp('2024-01-31'), pd.Timestamp('2024-02-09')]
+    assert months.loc['2024-01-31', 'Close'] == 7.5
+    assert months.loc['2024-02-09', 'Open'] == 8
+
+    weeks = resample_ohlcv(days, '1wk')
+    # The week of Jan 29 is one bar across the month end
+    week = weeks.loc['2024-02-02']
+    assert (week['Open'], week['Close']) == (5, 9.5)
+
+
+def test_forming_period_is_dated_by_its_latest_day():
+    days = daily('2024-05-01', '2024-05-22')  # ends on a Wednesday
+    weeks = resample_ohlcv(days, '1wk')
+    assert weeks.index[-1] == pd.Timestamp('2024-05-22')
+    assert (weeks['Open'].iloc[-1], weeks['Close'].iloc[-1]) == (13, 15.5)
+    months = resample_ohlcv(days, '1mo')
+    assert list(months.index) == [pd.Timestamp('2024-05-22')]
+    assert months['Volume'].iloc[0] == days['Volume'].sum()
+
+
+def test_nan_days_are_skipped():
+    days = daily('2024-03-04', '2024-03-08')
+    days.iloc[-1] = np.nan  # the provider had no values for Friday yet
+    week = resample_ohlcv(days, '1wk').iloc[-1]
+    assert (week['Open'], week['Close'], week['High']) == (0, 3.5, 13)
+
+
+def test_empty_and_missing_columns():
+    assert resample_ohlcv(daily('2024-01-06', '2024-01-07'), '1wk').empty
+    closes = daily('2024-03-04', '2024-03-15')[['Close']]
+    months = resample_ohlcv(closes, '1mo')
+    assert list(months.columns) == ['Close']
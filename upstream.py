@@ -0,0 +1,61 @@
+'''
+Bounded, deduplicated execution of upstream (market-data) calls.
+
+All provider calls run on one small thread pool so a burst of requests can't
+open more than UPSTREAM_CONCURRENCY connections to the data source. Calls are
+keyed: while a call for a key is in flight, later callers with the same key
+wait on the same future instead of starting another download (single flight).
+'''
+
+import os
+import threading
+from concurrent.futures import ThreadPoolExecutor
+
+UPSTREAM_CONCURRENCY = int(os.environ.get('UPSTREAM_CONCURRENCY', 4))
+# Seconds a request waits on an upstream call before giving up on it
+UPSTREAM_TIMEOUT = float(os.environ.get('UPSTREAM_TIMEOUT', 20))
+
+_inflight = {}
+_guard = threading.Lock()
+_pool = None
+_pool_pid = None
+
+
+def _executor():
+    # Thread pools don't survive fork, so each worker process builds its own
+    global _pool, _pool_pid
+    if _pool is None or _pool_pid != os.getpid():
+        _pool = ThreadPoolExecutor(max_workers=UPSTREAM_CONCURRENCY, thread_name_prefix='upstream')
+        _pool_pid = os.getpid()
+        _inflight.clear()
+    return _pool
+
+
+def _forget(key, future):
+    with _guard:
+        if _inflight.get(key) is future:
+            del _inflight[key]
+
+
+def submit(key, fn, *args):
+    '''Run fn(*args) on the upstream pool, joining an in-flight call with the same key.'''
+    with _guard:
+        future = _inflight.get(key)
+        if future is None:
+            future = _executor().submit(fn, *args)
+            _inflight[key] = future
+        else:
+            return future
+    # Registered outside the guard: the callback takes it and may run immediately
+    future.add_done_callback(lambda f: _forget(key, f))
+    return future
+
+
+def fetch(key, fn, *args, timeout=None):
+    '''Like submit() but waits for the result; raises TimeoutError after timeout seconds.
+
+    A timed-out call keeps running in the background, so its result still
+    lands wherever fn stores it.
+    '''
+    return submit(key, fn, *args).result(timeout=UPSTREAM_TIMEOUT if timeout is None else timeout)
+